@@ -0,0 +1,125 @@
+import atexit
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+from Discord.cards import USER_AGENT
+
+
+def chrome_options(headless=True):
+    options = Options()
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument(f'user-agent={USER_AGENT}')
+    options.add_argument('--ignore-certificate-errors')
+    return options
+
+
+class BrowserPool:
+    # Keeps up to `size` Chrome sessions alive and hands them out one caller at
+    # a time, so keywords and Streamlit requests reuse an already started browser.
+    def __init__(self, size=2, headless=True):
+        self.size = size
+        self.headless = headless
+        self._idle = []
+        self._drivers = []
+        # Browsers being launched; they count towards size but are started
+        # outside the lock.
+        self._starting = 0
+        self.closed = False
+        # Callers waiting for a browser are woken when one is returned,
+        # discarded or the pool is closed.
+        self._lock = threading.Condition()
+
+    def _checkout(self):
+        with self._lock:
+            while True:
+                if self.closed:
+                    raise RuntimeError('Browser pool is closed')
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._drivers) + self._starting < self.size:
+                    self._starting += 1
+                    break
+                self._lock.wait()
+        # Chrome takes seconds to start; other callers can start, return or
+        # take browsers meanwhile.
+        try:
+            driver = webdriver.Chrome(options=chrome_options(self.headless))
+        except BaseException:
+            with self._lock:
+                self._starting -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._starting -= 1
+            if not self.closed:
+                self._drivers.append(driver)
+                return driver
+        _quit(driver)
+        raise RuntimeError('Browser pool is closed')
+
+    def _checkin(self, driver):
+        with self._lock:
+            # A browser the pool no longer owns (closed while in use) is not
+            # handed out again.
+            if driver in self._drivers:
+                self._idle.append(driver)
+                self._lock.notify()
+                return
+        _quit(driver)
+
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+            self._lock.notify()
+        _quit(driver)
+
+    @contextmanager
+    def session(self):
+        driver = self._checkout()
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            # A crashed or hung browser is not handed out again.
+            if broken:
+                self._discard(driver)
+            else:
+                self._checkin(driver)
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            self._idle.clear()
+            self.closed = True
+            self._lock.notify_all()
+        for driver in drivers:
+            _quit(driver)
+
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except WebDriverException:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool(size=2, headless=True):
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = BrowserPool(size=size, headless=headless)
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,54 @@
+from bs4 import BeautifulSoup
+
+BASE_URL = 'https://discordservers.com'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
+CARD_ATTRS = {'role': 'region', 'aria-label': 'server name'}
+
+
+def member_count(members):
+    try:
+        return int(''.join(filter(str.isdigit, members)))
+    except Exception:
+        return 0
+
+def passes_member_filter(server, min_members=-1, max_members=-1):
+    members_int = server['Members'] or 0
+    if min_members != -1 and members_int < min_members:
+        return False
+    if max_members != -1 and members_int > max_members:
+        return False
+    return True
+
+def parse_server_card(card, base_url=BASE_URL, href=None):
+    name_tag = card.find('p', itemprop='name')
+    name = name_tag.get_text(strip=True) if name_tag else ''
+    desc_tag = card.find('div', itemprop='headline')
+    desc = desc_tag.get_text(strip=True) if desc_tag else ''
+    member_tag = card.find('span', class_='pl-2')
+    members = member_tag.get_text(strip=True) if member_tag else ''
+    if href is None:
+        parent_a = card.find_parent('a')
+        if parent_a and parent_a.has_attr('href'):
+            href = parent_a['href']
+    link = ''
+    if href:
+        if href.startswith('http'):
+            link = href
+        else:
+            link = base_url + href
+    return {
+        'Name': name,
+        'Description': desc,
+        'Members': member_count(members) if members else None,
+        'Link': link
+    }
+
+def parse_server_cards(html, base_url=BASE_URL):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [parse_server_card(card, base_url) for card in soup.find_all('article', attrs=CARD_ATTRS)]
+
+def parse_card_fragment(card_html, href, base_url=BASE_URL):
+    # Parses a single card's outerHTML; the link comes from its enclosing <a>,
+    # which is not part of the fragment.
+    card = BeautifulSoup(card_html, 'html.parser').find('article', attrs=CARD_ATTRS)
+    return parse_server_card(card, base_url, href) if card else None
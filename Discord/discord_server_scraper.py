@@ -1,113 +1,218 @@
 import argparse
-import xlsxwriter
-import time
-from bs4 import BeautifulSoup
-from selenium import webdriver
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException, TimeoutException
+from Discord.browser_pool import get_browser_pool
+from Discord.cards import BASE_URL, parse_card_fragment, passes_member_filter
+from Discord.http_backend import PaginationUnsupported, iter_search_pages
+from metrics import add_metrics_args, get_metrics, run_instrumented
+from output_sink import open_sink
+from Reddit.keywords import load_keywords
+from result_store import DISCORD_COLUMNS
+
+FIELDNAMES = ['Name', 'Description', 'Members', 'Link']
+CARD_SELECTOR = 'article[role="region"][aria-label="server name"]'
+LOAD_MORE_XPATH = "//button[contains(., 'Load More Servers')]"
+# Returns [outerHTML, href of the enclosing link] for every card from index
+# arguments[1] on, so each load only hands back the cards it appended.
+NEW_CARDS_JS = """
+return Array.from(document.querySelectorAll(arguments[0])).slice(arguments[1]).map(function (card) {
+    var link = card.closest('a');
+    return [card.outerHTML, link ? link.getAttribute('href') : null];
+});
+"""
 
 
 def parse_args():
-    parser = argparse.ArgumentParser(description='Discord Server Scraper (discordservers.com, Selenium)')
-    parser.add_argument('--keyword', required=True, help='Keyword to search in server name or description')
-    parser.add_argument('--max-loads', type=int, default=5, help='How many times to click Load More Servers')
+    parser = argparse.ArgumentParser(description='Discord Server Scraper (discordservers.com)')
+    parser.add_argument('--keyword', action='append', default=[], help='Keyword to search in server name or description; repeat to scrape several keywords in parallel')
+    parser.add_argument('--keywords-file', help='File with one keyword per line (lines starting with # are ignored)')
+    parser.add_argument('--batch-layout', choices=['combined', 'sheets'], default='combined', help='With several keywords: one table with a Keyword column, or one sheet per keyword (xlsx only)')
+    parser.add_argument('--max-loads', type=int, default=5, help='How many more result pages to load after the first (Load More Servers clicks)')
     parser.add_argument('--min-members', type=int, default=-1, help='Minimum member count (-1 for no limit)')
     parser.add_argument('--max-members', type=int, default=-1, help='Maximum member count (-1 for no limit)')
-    parser.add_argument('--output', required=True, help='Output Excel file path (.xlsx)')
+    parser.add_argument('--output', required=True, help='Output file path (.xlsx, .csv, .jsonl or .parquet)')
+    parser.add_argument('--backend', choices=['auto', 'http', 'selenium'], default='auto', help='Fetch result pages over HTTP, drive Chrome with Selenium, or try HTTP and fall back to Selenium (auto)')
+    parser.add_argument('--base-url', default=BASE_URL, help='Site to scrape; point at a local server to replay saved pages')
+    parser.add_argument('--workers', type=int, default=4, help='Result pages fetched concurrently by the HTTP backend')
+    parser.add_argument('--browsers', type=int, default=2, help='Chrome sessions kept open for the Selenium backend')
+    parser.add_argument('--keyword-workers', type=int, default=4, help='Keywords scraped at the same time (Selenium scrapes still share the --browsers sessions)')
+    parser.add_argument('--show-browser', action='store_true', help='Run Chrome with a visible window instead of headless')
+    add_metrics_args(parser)
     parser.add_argument('--debug', action='store_true', help='Enable debug output')
-    return parser.parse_args()
-
-def scrape_discordservers(keyword, max_loads=5, min_members=-1, max_members=-1, debug=False):
-    url = f'https://discordservers.com/search/{keyword}'
-    chrome_options = Options()
-    chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--window-size=1920,1080')
-    chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36')
-    chrome_options.add_argument('--ignore-certificate-errors')
-    driver = webdriver.Chrome(options=chrome_options)
-    driver.get(url)
-    time.sleep(3)
-    for i in range(max_loads):
+    args = parser.parse_args()
+    args.keyword = [keyword for keyword in args.keyword if keyword.strip()] + load_keywords(keywords_file=args.keywords_file)
+    if not args.keyword:
+        parser.error('--keyword or --keywords-file is required')
+    return args
+
+def _card_count(driver):
+    return len(driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR))
+
+def _new_cards(driver, start, base_url):
+    metrics = get_metrics()
+    with metrics.time('selenium_cards'):
+        cards = driver.execute_script(NEW_CARDS_JS, CARD_SELECTOR, start)
+    for card_html, href in cards:
+        metrics.add_bytes('selenium_cards', len(card_html))
+        with metrics.time('parse'):
+            server = parse_card_fragment(card_html, href, base_url)
+        metrics.count('parse', 'cards' if server is not None else 'skipped')
+        if server is not None:
+            yield server
+
+def iter_servers_selenium(keyword, max_loads=5, base_url=BASE_URL, debug=False, pool=None, timeout=10):
+    # Yields the cards of each load as soon as they appear, parsing only the
+    # cards appended since the previous load.
+    url = f'{base_url}/search/{keyword}'
+    pool = pool or get_browser_pool()
+    metrics = get_metrics()
+    with pool.session() as driver:
+        wait = WebDriverWait(driver, timeout)
         try:
-            load_more = driver.find_element(By.XPATH, "//button[contains(., 'Load More Servers')]")
-            driver.execute_script("arguments[0].scrollIntoView();", load_more)
-            time.sleep(1)
-            load_more.click()
+            with metrics.time('selenium_load'):
+                driver.get(url)
+                wait.until(lambda d: _card_count(d) > 0)
+        except TimeoutException:
             if debug:
-                print(f"Clicked Load More Servers ({i+1}/{max_loads})")
-            time.sleep(2.5)
-        except (NoSuchElementException, ElementClickInterceptedException):
-            if debug:
-                print("No more 'Load More Servers' button found or not clickable.")
-            break
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    server_cards = soup.find_all('article', attrs={'role': 'region', 'aria-label': 'server name'})
-    if not server_cards:
-        print('Hiç sunucu bulunamadı!')
-        driver.quit()
-        return []
-    servers = []
-    for idx, card in enumerate(server_cards, 1):
-        name_tag = card.find('p', itemprop='name')
-        name = name_tag.get_text(strip=True) if name_tag else ''
-        desc_tag = card.find('div', itemprop='headline')
-        desc = desc_tag.get_text(strip=True) if desc_tag else ''
-        member_tag = card.find('span', class_='pl-2')
-        members = member_tag.get_text(strip=True) if member_tag else ''
-        try:
-            members_int = int(''.join(filter(str.isdigit, members)))
-        except Exception:
-            members_int = 0
+                print(f'No server cards appeared within {timeout}s')
+            return
+        parsed = 0
+        for i in range(max_loads + 1):
+            count = _card_count(driver)
+            yield from _new_cards(driver, parsed, base_url)
+            parsed = count
+            if i == max_loads:
+                break
+            try:
+                load_more = driver.find_element(By.XPATH, LOAD_MORE_XPATH)
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", load_more)
+                with metrics.time('selenium_load'):
+                    wait.until(EC.element_to_be_clickable(load_more))
+                    load_more.click()
+                    # Wait for the new cards instead of sleeping a fixed time.
+                    wait.until(lambda d: _card_count(d) > count)
+                if debug:
+                    print(f"Clicked Load More Servers ({i+1}/{max_loads}), {_card_count(driver)} cards")
+            except (NoSuchElementException, ElementClickInterceptedException, TimeoutException):
+                if debug:
+                    print("No more 'Load More Servers' button found or no new servers loaded.")
+                break
+
+def iter_discordservers(keyword, max_loads=5, min_members=-1, max_members=-1, debug=False, backend='auto', base_url=BASE_URL, workers=4, pool=None):
+    seen = set()
+
+    def accept(server):
+        key = server['Link'] or server['Name']
+        if key in seen:
+            return False
+        seen.add(key)
         # Min/max filtrelemesi
-        if min_members != -1 and members_int < min_members:
-            continue
-        if max_members != -1 and members_int > max_members:
-            continue
-        parent_a = card.find_parent('a')
-        link = ''
-        if parent_a and parent_a.has_attr('href'):
-            if parent_a['href'].startswith('http'):
-                link = parent_a['href']
+        return passes_member_filter(server, min_members, max_members)
+
+    if backend in ('auto', 'http'):
+        try:
+            for server in iter_search_pages(keyword, max_loads=max_loads, base_url=base_url, workers=workers, debug=debug):
+                if accept(server):
+                    yield server
+        except PaginationUnsupported as e:
+            if backend == 'auto':
+                print(f'[WARN] HTTP pagination is not supported ({e}), falling back to Selenium')
+                backend = 'selenium'
             else:
-                link = 'https://discordservers.com' + parent_a['href']
-        print(f"[{idx}] Ad: {name}\nAçıklama: {desc}\nÜye: {members}\nLink: {link}\n")
-        servers.append({
-            'Name': name,
-            'Description': desc,
-            'Members': members,
-            'Link': link
-        })
-    driver.quit()
+                print(f'[WARN] HTTP pagination is not supported ({e}), only the first page was scraped')
+        if not seen and backend == 'auto':
+            if debug:
+                print('HTTP backend found no servers, falling back to Selenium')
+            backend = 'selenium'
+    if backend == 'selenium':
+        for server in iter_servers_selenium(keyword, max_loads=max_loads, base_url=base_url, debug=debug, pool=pool):
+            if accept(server):
+                yield server
+
+def scrape_discordservers(keyword, max_loads=5, min_members=-1, max_members=-1, debug=False, backend='auto', base_url=BASE_URL, workers=4, pool=None):
+    servers = []
+    for idx, server in enumerate(iter_discordservers(keyword, max_loads, min_members, max_members, debug, backend, base_url, workers, pool), 1):
+        print(f"[{idx}] Ad: {server['Name']}\nAçıklama: {server['Description']}\nÜye: {server['Members']}\nLink: {server['Link']}\n")
+        servers.append(server)
+    if not servers:
+        print('Hiç sunucu bulunamadı!')
     return servers
 
-def write_excel_with_links(rows, output_xlsx):
-    fieldnames = ['Name', 'Description', 'Members', 'Link']
-    workbook = xlsxwriter.Workbook(output_xlsx)
-    worksheet = workbook.add_worksheet()
-    for col, name in enumerate(fieldnames):
-        worksheet.write(0, col, name)
-    for row_idx, row in enumerate(rows, 1):
-        for col, key in enumerate(fieldnames):
-            if key == 'Link' and row.get('Link'):
-                worksheet.write_url(row_idx, col, row['Link'], string=row['Link'])
-            else:
-                worksheet.write(row_idx, col, row.get(key, ''))
-    workbook.close()
+def iter_keywords(keywords, max_loads=5, min_members=-1, max_members=-1, debug=False, backend='auto', base_url=BASE_URL, workers=4, pool=None, keyword_workers=4):
+    # Up to keyword_workers keywords run at once, each in its own thread;
+    # Selenium scrapes share the pool's browser sessions, so at most
+    # pool.size Chrome instances are open whatever keyword_workers is.
+    # (keyword, server) pairs are yielded as soon as any keyword produces one.
+    pool = pool or get_browser_pool()
+    results = queue.Queue()
+    done = object()
 
-def main():
-    args = parse_args()
-    servers = scrape_discordservers(
-        keyword=args.keyword,
+    def scrape(keyword):
+        try:
+            for server in iter_discordservers(keyword, max_loads, min_members, max_members, debug, backend, base_url, workers, pool):
+                results.put((keyword, server))
+        except Exception as e:
+            print(f'Error for {keyword}: {e}')
+        finally:
+            results.put((keyword, done))
+
+    with ThreadPoolExecutor(max_workers=max(1, keyword_workers)) as executor:
+        for keyword in keywords:
+            executor.submit(scrape, keyword)
+        remaining = len(keywords)
+        try:
+            while remaining:
+                keyword, server = results.get()
+                if server is done:
+                    remaining -= 1
+                else:
+                    yield keyword, server
+        finally:
+            # Keywords that have not started yet are skipped when the
+            # consumer stops early.
+            executor.shutdown(cancel_futures=True)
+
+def scrape_keywords(keywords, max_loads=5, min_members=-1, max_members=-1, debug=False, backend='auto', base_url=BASE_URL, workers=4, pool=None, keyword_workers=4):
+    results = {keyword: [] for keyword in keywords}
+    for keyword, server in iter_keywords(keywords, max_loads, min_members, max_members, debug, backend, base_url, workers, pool, keyword_workers):
+        results[keyword].append(server)
+    return results
+
+def run(args):
+    pool = get_browser_pool(size=args.browsers, headless=not args.show_browser)
+    keywords = args.keyword
+    servers = iter_keywords(
+        keywords,
         max_loads=args.max_loads,
         min_members=args.min_members,
         max_members=args.max_members,
-        debug=args.debug
+        debug=args.debug,
+        backend=args.backend,
+        base_url=args.base_url,
+        workers=args.workers,
+        pool=pool,
+        keyword_workers=args.keyword_workers
     )
-    if servers:
-        write_excel_with_links(servers, args.output)
-        print(f'Successfully wrote {len(servers)} servers to {args.output}')
+    fieldnames = FIELDNAMES if len(keywords) == 1 else ['Keyword'] + FIELDNAMES
+    sheet_field = 'Keyword' if len(keywords) > 1 and args.batch_layout == 'sheets' else None
+    try:
+        with open_sink(args.output, fieldnames, sheet_field=sheet_field, columns=DISCORD_COLUMNS) as sink:
+            for idx, (keyword, server) in enumerate(servers, 1):
+                print(f"[{idx}] Ad: {server['Name']}\nAçıklama: {server['Description']}\nÜye: {server['Members']}\nLink: {server['Link']}\n")
+                sink.write(dict(server, Keyword=keyword))
+    finally:
+        # Closing the pool first ends running Selenium scrapes, so the
+        # keyword threads finish quickly and no Chrome process is left behind.
+        pool.close()
+        servers.close()
+    print(f'Successfully wrote {sink.rows_written} servers to {args.output}')
+
+def main():
+    run_instrumented(parse_args(), run)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
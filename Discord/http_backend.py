@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import requests
+from Discord.cards import BASE_URL, USER_AGENT, parse_server_cards
+from metrics import get_metrics
+
+# Search results are served page by page; page 1 is what the browser shows
+# before "Load More Servers" is clicked.
+SEARCH_PAGE_URL = '{base_url}/search/{keyword}?page={page}'
+
+
+class PaginationUnsupported(Exception):
+    # A later search page added no new servers, i.e. the site ignored ?page=N
+    # and served an earlier page again.
+    pass
+
+
+def search_page_url(keyword, page, base_url=BASE_URL):
+    return SEARCH_PAGE_URL.format(base_url=base_url.rstrip('/'), keyword=quote(keyword), page=page)
+
+def fetch_search_page(session, keyword, page, base_url=BASE_URL, debug=False):
+    url = search_page_url(keyword, page, base_url)
+    metrics = get_metrics()
+    try:
+        with metrics.time('http_fetch'):
+            resp = session.get(url, timeout=15)
+        metrics.add_bytes('http_fetch', len(resp.content))
+        metrics.count('http_fetch', f'HTTP {resp.status_code}')
+        if resp.status_code != 200:
+            if debug:
+                print(f'[http] {url} -> HTTP {resp.status_code}')
+            return []
+        with metrics.time('parse'):
+            servers = parse_server_cards(resp.text, base_url)
+        metrics.count('parse', 'cards', len(servers))
+        if debug:
+            print(f'[http] {url} -> {len(servers)} servers')
+        return servers
+    except Exception as e:
+        print(f'Error for {url}: {e}')
+        return []
+
+def iter_search_pages(keyword, max_loads=5, base_url=BASE_URL, workers=4, debug=False):
+    # The Selenium path shows max_loads + 1 pages (the first page plus one per
+    # click), so the same pages are fetched here concurrently and yielded in
+    # page order as soon as each is ready. Fetching stops at the first empty
+    # page, as that is where the browser would stop. A page that only repeats
+    # servers from earlier pages raises PaginationUnsupported.
+    pages = range(1, max_loads + 2)
+    with requests.Session() as session:
+        session.headers.update({'User-Agent': USER_AGENT})
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(fetch_search_page, session, keyword, page, base_url, debug) for page in pages]
+            links = set()
+            try:
+                for page, future in zip(pages, futures):
+                    page_servers = future.result()
+                    if not page_servers:
+                        break
+                    page_links = {server['Link'] or server['Name'] for server in page_servers}
+                    if page > 1 and page_links <= links:
+                        raise PaginationUnsupported(f'page {page} of the search for {keyword!r} repeats earlier pages')
+                    links |= page_links
+                    yield from page_servers
+            finally:
+                for future in futures:
+                    future.cancel()
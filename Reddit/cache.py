@@ -0,0 +1,74 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_FILE = 'reddit_cache.sqlite3'
+
+# Seconds each kind of entry stays fresh.
+DEFAULT_TTLS = {
+    'discovery': 24 * 3600,
+    'listing': 24 * 3600,
+    'latest_post': 3600,
+    'rules': 7 * 24 * 3600,
+    'online': 15 * 60,
+    'source_stats': 90 * 24 * 3600,
+}
+
+# Listing fields kept per subreddit; enough to rebuild a Subreddit object that
+# passes filter_subreddit and get_subreddit_data without refetching.
+LISTING_FIELDS = [
+    'display_name', 'id', 'name', 'title', 'public_description', 'subscribers',
+    'active_user_count', 'accounts_active', 'over18', 'created_utc', 'url',
+]
+
+def get_cache_path():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_FILE)
+
+def listing_data(sub):
+    data = vars(sub)
+    return {field: data[field] for field in LISTING_FIELDS if data.get(field) is not None}
+
+
+class SubredditCache:
+    def __init__(self, path=None, ttls=None):
+        self.path = path or get_cache_path()
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'name TEXT NOT NULL, kind TEXT NOT NULL, value TEXT NOT NULL, fetched_at REAL NOT NULL, '
+                'PRIMARY KEY (name, kind))'
+            )
+            self._conn.commit()
+
+    def get(self, name, kind):
+        with self._lock:
+            found = self._conn.execute(
+                'SELECT value, fetched_at FROM entries WHERE name = ? AND kind = ?',
+                (name.lower(), kind)
+            ).fetchone()
+        if found is None:
+            return None
+        value, fetched_at = found
+        if time.time() - fetched_at > self.ttls.get(kind, 0):
+            return None
+        return json.loads(value)
+
+    def set(self, name, kind, value):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (name, kind, value, fetched_at) VALUES (?, ?, ?, ?)',
+                (name.lower(), kind, json.dumps(value), time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
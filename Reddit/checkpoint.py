@@ -0,0 +1,112 @@
+import os
+import json
+import threading
+from output_sink import drop_partial_line
+from Reddit.subreddit_scraper import REPLAY_SOURCE
+
+
+def get_checkpoint_path(output):
+    return output + '.checkpoint.json'
+
+# Processed subreddit names are appended to a log next to the checkpoint, one
+# per line, so a save only writes the names done since the previous one
+# instead of the whole set.
+SEEN_LOG_SUFFIX = '.seen'
+
+
+class CrawlCheckpoint:
+    def __init__(self, path, save_every=100, before_save=None):
+        self.path = path
+        self.save_every = save_every
+        # Lets the caller flush its output first, so rows counted as written
+        # in the checkpoint are really on disk.
+        self.before_save = before_save
+        self.source_index = REPLAY_SOURCE
+        # Discovery source labels in the order the crawl started with.
+        self.sources = None
+        self.after = None
+        self.seen = set()
+        self._new_seen = []
+        # A new crawl starts a new log; a loaded one appends to its own.
+        self._log_mode = 'w'
+        self.checked = 0
+        self.rows_written = 0
+        self._positions = {}
+        self._since_save = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, save_every=100, before_save=None):
+        checkpoint = cls(path, save_every=save_every, before_save=before_save)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                state = json.load(f)
+            checkpoint.source_index = state['source_index']
+            checkpoint.sources = state.get('sources')
+            checkpoint.after = state['after']
+            log_path = path + SEEN_LOG_SUFFIX
+            if 'seen' in state:
+                # Older checkpoints kept the names in the state itself; they
+                # move to a new log on the next save.
+                checkpoint.seen = set(state['seen'])
+                checkpoint._new_seen = sorted(checkpoint.seen)
+            elif os.path.exists(log_path):
+                drop_partial_line(log_path)
+                checkpoint.seen = set(read_seen_log(log_path))
+                checkpoint._log_mode = 'a'
+            checkpoint.checked = state['checked']
+            checkpoint.rows_written = state['rows_written']
+        return checkpoint
+
+    def note(self, name, source_index, after):
+        # Called by the crawl when it yields a subreddit; the position only
+        # becomes the resume point once that subreddit has been processed.
+        with self._lock:
+            self._positions[name] = (source_index, after)
+
+    def done(self, name, rows_written):
+        with self._lock:
+            position = self._positions.pop(name, None)
+            if position is not None:
+                self.source_index, self.after = position
+            if name not in self.seen:
+                self.seen.add(name)
+                self._new_seen.append(name)
+            self.checked += 1
+            self.rows_written = rows_written
+            self._since_save += 1
+            if self._since_save < self.save_every:
+                return
+        self.save()
+
+    def save(self):
+        if self.before_save is not None:
+            self.before_save()
+        with self._lock:
+            state = {
+                'source_index': self.source_index,
+                'sources': self.sources,
+                'after': self.after,
+                'checked': self.checked,
+                'rows_written': self.rows_written,
+            }
+            new_seen, self._new_seen = self._new_seen, []
+            mode, self._log_mode = self._log_mode, 'a'
+            self._since_save = 0
+        # The names go to disk before the position that covers them.
+        with open(self.path + SEEN_LOG_SUFFIX, mode, encoding='utf-8') as f:
+            f.writelines(name + '\n' for name in new_seen)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        for path in (self.path, self.path + SEEN_LOG_SUFFIX):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def read_seen_log(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
@@ -0,0 +1,96 @@
+import threading
+import time
+
+# Matching subreddits per discovery request assumed for a kind of source
+# before any history exists. Keyword-targeted sources start well ahead of the
+# broad listings, which mostly return subreddits the filters reject.
+PRIOR_YIELD = {
+    'cache': 100.0,
+    'search_by_name': 2.0,
+    'search': 1.0,
+    'expansion_search_by_name': 0.5,
+    'expansion_search': 0.3,
+    'popular': 0.05,
+    'default': 0.05,
+    'new': 0.02,
+    'vowel_search': 0.02,
+}
+# How many requests' worth of evidence the prior counts for.
+PRIOR_WEIGHT = 5
+SOURCE_STATS_KEY = '__sources__'
+COUNTS = ('requests', 'candidates', 'hits')
+
+
+class DiscoveryStats:
+    # Tracks what each kind of discovery source costs (requests) and earns
+    # (candidates, subreddits that passed the filters). Totals from earlier
+    # runs are kept in the cache and used to order the sources of the next one.
+    def __init__(self, history=None):
+        self.history = history or {}
+        self.counts = {}
+        self.started = time.monotonic()
+        self.first_match = None
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, cache):
+        history = cache.get(SOURCE_STATS_KEY, 'source_stats') if cache is not None else None
+        return cls(history)
+
+    def save(self, cache):
+        if cache is None:
+            return
+        with self._lock:
+            merged = {}
+            for kind in set(self.history) | set(self.counts):
+                merged[kind] = {
+                    count: self.history.get(kind, {}).get(count, 0) + self.counts.get(kind, {}).get(count, 0)
+                    for count in COUNTS
+                }
+        cache.set(SOURCE_STATS_KEY, 'source_stats', merged)
+
+    def _counts_for(self, kind):
+        return self.counts.setdefault(kind, dict.fromkeys(COUNTS, 0))
+
+    def expected_yield(self, kind):
+        past = self.history.get(kind, {})
+        prior = PRIOR_YIELD.get(kind, 0.0)
+        return (past.get('hits', 0) + prior * PRIOR_WEIGHT) / (past.get('requests', 0) + PRIOR_WEIGHT)
+
+    def request(self, kind):
+        with self._lock:
+            self._counts_for(kind)['requests'] += 1
+
+    def found(self, kind, name):
+        with self._lock:
+            self._counts_for(kind)['candidates'] += 1
+            self._sources[name] = kind
+
+    def result(self, name, passed):
+        with self._lock:
+            kind = self._sources.pop(name, None)
+            if not passed:
+                return
+            if self.first_match is None:
+                self.first_match = time.monotonic() - self.started
+            if kind is not None:
+                self._counts_for(kind)['hits'] += 1
+
+    def summary(self, api_requests=None):
+        with self._lock:
+            counts = {kind: dict(values) for kind, values in self.counts.items()}
+        lines = ['Discovery sources:']
+        hits = 0
+        for kind, values in sorted(counts.items(), key=lambda item: -item[1]['hits']):
+            hits += values['hits']
+            rate = values['hits'] / values['candidates'] if values['candidates'] else 0.0
+            line = f"  {kind}: {values['requests']} requests, {values['candidates']} candidates, {values['hits']} matched ({rate:.1%})"
+            if values['requests']:
+                line += f", {values['hits'] / values['requests']:.2f} matches per request"
+            lines.append(line)
+        if self.first_match is not None:
+            lines.append(f'First match after {self.first_match:.1f}s')
+        if api_requests is not None and hits:
+            lines.append(f'{api_requests / hits:.1f} API requests per matching subreddit')
+        return '\n'.join(lines)
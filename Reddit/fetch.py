@@ -0,0 +1,84 @@
+import re
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# requests only decodes brotli bodies when one of these packages is installed.
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+FACEPLATE_RE = re.compile(r'<faceplate-number\b([^>]*)>', re.IGNORECASE)
+NUMBER_ATTR_RE = re.compile(r'\bnumber\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+SPAN_TAG_RE = re.compile(r'<(/?)span\b', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]*>')
+# How far around a <faceplate-number> to look for its enclosing <span>.
+SPAN_WINDOW = 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(pool_size=32):
+    # One keep-alive session shared by all worker threads, so each host costs
+    # a single TCP/TLS handshake per pooled connection instead of per request.
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+            _session = session
+        return _session
+
+def _enclosing_spans(html, start, end, levels=3):
+    # Walks the span tags around html[start:end] and returns the text of the
+    # spans that contain it, innermost first, without parsing the rest of the page.
+    opens = []
+    depth = 0
+    for tag in reversed(list(SPAN_TAG_RE.finditer(html, max(0, start - SPAN_WINDOW), start))):
+        if tag.group(1):
+            depth += 1
+        elif depth:
+            depth -= 1
+        else:
+            opens.append(tag.start())
+            if len(opens) == levels:
+                break
+    closes = []
+    depth = 0
+    for tag in SPAN_TAG_RE.finditer(html, end, min(len(html), end + SPAN_WINDOW)):
+        if len(closes) == len(opens):
+            break
+        if not tag.group(1):
+            depth += 1
+        elif depth:
+            depth -= 1
+        else:
+            closes.append(tag.start())
+    return [html[open_at:close_at] for open_at, close_at in zip(opens, closes)]
+
+def extract_online_count(html):
+    if 'faceplate-number' not in html:
+        return ''
+    lowered = html.lower()
+    for match in FACEPLATE_RE.finditer(html):
+        number = NUMBER_ATTR_RE.search(match.group(1))
+        if not number:
+            continue
+        # Skip counts with no "online" text anywhere near them.
+        if lowered.find('online', max(0, match.start() - SPAN_WINDOW), match.end() + SPAN_WINDOW) == -1:
+            continue
+        for span in _enclosing_spans(html, match.start(), match.end()):
+            if 'online' in TAG_RE.sub(' ', span).lower():
+                return number.group(1)
+    return ''
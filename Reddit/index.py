@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import threading
+import time
+
+INDEX_FILE = 'reddit_index.sqlite3'
+
+# FTS5 trigram phrases match substrings of at least three characters; shorter
+# keywords fall back to a LIKE scan over the base table.
+MIN_TRIGRAM_LENGTH = 3
+
+def get_index_path():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), INDEX_FILE)
+
+
+class SubredditIndex:
+    def __init__(self, path=None, commit_every=500):
+        self.path = path or get_index_path()
+        self.commit_every = commit_every
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS subreddits ('
+                'name TEXT PRIMARY KEY, display_name TEXT NOT NULL, title TEXT, '
+                'public_description TEXT, subscribers INTEGER, indexed_at REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS subreddits_subscribers ON subreddits (subscribers)')
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS subreddit_fts "
+                "USING fts5(title, public_description, tokenize='trigram')"
+            )
+            self._conn.commit()
+
+    def add(self, display_name, title, public_description, subscribers):
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO subreddits (name, display_name, title, public_description, subscribers, indexed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET display_name = excluded.display_name, title = excluded.title, '
+                'public_description = excluded.public_description, subscribers = excluded.subscribers, '
+                'indexed_at = excluded.indexed_at',
+                (display_name.lower(), display_name, title or '', public_description or '', subscribers, time.time())
+            )
+            rowid = self._conn.execute('SELECT rowid FROM subreddits WHERE name = ?', (display_name.lower(),)).fetchone()[0]
+            self._conn.execute('DELETE FROM subreddit_fts WHERE rowid = ?', (rowid,))
+            self._conn.execute(
+                'INSERT INTO subreddit_fts (rowid, title, public_description) VALUES (?, ?, ?)',
+                (rowid, title or '', public_description or '')
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM subreddits').fetchone()[0]
+
+    def query(self, keyword, min_subs=-1, max_subs=-1, limit=-1):
+        keyword = (keyword or '').lower()
+        conditions = []
+        params = []
+        if len(keyword) >= MIN_TRIGRAM_LENGTH:
+            sql = 'SELECT s.display_name, s.title, s.public_description, s.subscribers FROM subreddit_fts f JOIN subreddits s ON s.rowid = f.rowid'
+            conditions.append('subreddit_fts MATCH ?')
+            params.append('"' + keyword.replace('"', '""') + '"')
+        else:
+            sql = 'SELECT s.display_name, s.title, s.public_description, s.subscribers FROM subreddits s'
+            if keyword:
+                pattern = '%' + keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                conditions.append("(lower(s.title) LIKE ? ESCAPE '\\' OR lower(s.public_description) LIKE ? ESCAPE '\\')")
+                params.extend([pattern, pattern])
+        if min_subs != -1:
+            conditions.append('s.subscribers >= ?')
+            params.append(min_subs)
+        if max_subs != -1:
+            conditions.append('s.subscribers <= ?')
+            params.append(max_subs)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY s.subscribers DESC'
+        if limit != -1:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            found = self._conn.execute(sql, params).fetchall()
+        return [
+            {'display_name': display_name, 'title': title, 'public_description': description, 'subscribers': subscribers}
+            for display_name, title, description, subscribers in found
+        ]
+
+    def query_any(self, keywords, min_subs=-1, max_subs=-1, limit=-1):
+        # Union of the per-keyword matches, largest subreddits first.
+        found = {}
+        for keyword in keywords:
+            for data in self.query(keyword, min_subs, max_subs, limit):
+                found.setdefault(data['display_name'], data)
+        rows = sorted(found.values(), key=lambda data: data['subscribers'] or 0, reverse=True)
+        return rows if limit == -1 else rows[:limit]
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,91 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    # Aho-Corasick automaton over lower-cased keywords: one pass over a text
+    # finds every keyword it contains, however many keywords there are.
+    def __init__(self, keywords):
+        self.keywords = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+        for keyword in keywords:
+            keyword = keyword.strip().lower()
+            if keyword and keyword not in self.keywords:
+                self.keywords.append(keyword)
+                self._add(keyword)
+        self._build()
+
+    def _add(self, keyword):
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+            state = nxt
+        self._out[state].add(keyword)
+
+    def _build(self):
+        # Children of the root fail back to the root; deeper states follow
+        # their parent's failure links until the same character continues.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def find(self, text):
+        found = set()
+        state = 0
+        goto = self._goto
+        fail = self._fail
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if self._out[state]:
+                found |= self._out[state]
+        return found
+
+    def matches(self, text):
+        return bool(self.find(text))
+
+    def matched(self, text):
+        # Matching keywords in the order they were given.
+        found = self.find(text)
+        return [keyword for keyword in self.keywords if keyword in found]
+
+
+def load_keywords(keywords=None, keywords_file=None):
+    found = []
+    if keywords:
+        found.extend(part for part in keywords.split(','))
+    if keywords_file:
+        with open(keywords_file, encoding='utf-8') as f:
+            found.extend(line for line in f if not line.strip().startswith('#'))
+    return [keyword.strip() for keyword in found if keyword.strip()]
+
+def keyword_expansions(keyword):
+    # Spellings a subreddit name or title is likely to use for the keyword:
+    # without spaces/underscores/hyphens and the singular or plural form.
+    keyword = keyword.strip().lower()
+    variants = [keyword.replace(' ', ''), keyword.replace(' ', '_')]
+    if keyword.endswith('s') and len(keyword) > 3:
+        variants.append(keyword[:-1])
+    else:
+        variants.append(keyword + 's')
+    expansions = []
+    for variant in variants:
+        if variant and variant != keyword and variant not in expansions:
+            expansions.append(variant)
+    return expansions
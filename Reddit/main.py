@@ -1,87 +1,322 @@
 import argparse
-import requests
-from bs4 import BeautifulSoup
-import xlsxwriter
-from Reddit.subreddit_scraper import fetch_all_subreddits, filter_subreddit, get_subreddit_data
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from metrics import add_metrics_args, get_metrics, run_instrumented
+from output_sink import open_sink
+from praw.models import Subreddit
+from Reddit.cache import DEFAULT_TTLS, SubredditCache, listing_data
+from Reddit.checkpoint import CrawlCheckpoint, get_checkpoint_path
+from Reddit.discovery import DiscoveryStats
+from Reddit.fetch import extract_online_count, get_session
+from Reddit.index import SubredditIndex
+from Reddit.keywords import KeywordMatcher, load_keywords
+from Reddit.ratelimit import get_scheduler, scheduled_get
+from Reddit.reddit_client import get_thread_reddit_client
+from Reddit.subreddit_scraper import FilterStats, fetch_all_subreddits, filter_subreddit, get_subreddit_data, hydrate_subreddits, keyword_text, subreddits_from_index
+from result_store import REDDIT_COLUMNS, export_rows, result_frame
 
-def get_online_users_requests(subreddit_url):
+def subreddit_name_from_url(subreddit_url):
+    return subreddit_url.rstrip('/').rsplit('/', 1)[-1]
+
+def get_online_users_requests(subreddit_url, cache=None):
+    metrics = get_metrics()
+    if cache is not None:
+        cached = cache.get(subreddit_name_from_url(subreddit_url), 'online')
+        metrics.cache('online_fetch', cached is not None)
+        if cached is not None:
+            return cached
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
-        resp = requests.get(subreddit_url, headers=headers, timeout=10)
-        if resp.status_code == 200:
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            for span in soup.find_all('span'):
-                if 'online' in span.text.lower():
-                    faceplate = span.find('faceplate-number')
-                    if faceplate and faceplate.has_attr('number'):
-                        print(f"[requests] {subreddit_url} -> {faceplate['number']}")
-                        return faceplate['number']
-            for faceplate in soup.find_all('faceplate-number'):
-                parent = faceplate.find_parent('span')
-                if parent and 'online' in parent.text.lower():
-                    print(f"[requests] {subreddit_url} -> {faceplate.get('number')}")
-                    return faceplate.get('number')
-        return ''
+        with metrics.time('online_fetch'):
+            resp = scheduled_get(subreddit_url, session=get_session(), timeout=10)
+        metrics.add_bytes('online_fetch', len(resp.content))
+        metrics.count('online_fetch', f'HTTP {resp.status_code}')
+        if resp.status_code != 200:
+            return ''
+        with metrics.time('online_parse'):
+            online = extract_online_count(resp.text)
+        if online:
+            print(f"[requests] {subreddit_url} -> {online}")
+        if cache is not None:
+            cache.set(subreddit_name_from_url(subreddit_url), 'online', online)
+        return online
     except Exception as e:
         print(f"Error for {subreddit_url}: {e}")
         return ''
 
+def build_row(sub, keyword, min_subs, max_subs, max_age_days, debug=False, stats=None, cache=None):
+    # Runs on a worker thread: the subreddit is rebuilt on this thread's own
+    # client so that every request below goes through it.
+    sub = Subreddit(get_thread_reddit_client(), _data=listing_data(sub))
+    if debug:
+        print(f'Checking subreddit: {sub.display_name}')
+    if not filter_subreddit(sub, keyword, min_subs, max_subs, max_age_days, debug=debug, stats=stats, cache=cache):
+        if debug:
+            print(f'  -> FAILED: {sub.display_name}')
+        return None
+    if debug:
+        print(f'  -> PASSED: {sub.display_name}')
+    row = get_subreddit_data(sub, debug=debug, cache=cache)
+    if isinstance(keyword, KeywordMatcher):
+        row['Keywords'] = ', '.join(keyword.matched(keyword_text(sub)))
+    # Online Ratio is derived from the typed columns when the row is exported.
+    row['Online Users'] = get_online_users_requests(row['Link'], cache=cache)
+    row.pop('Active Users', None)
+    return row
+
+def enrich_subreddits(subs, keyword, min_subs, max_subs, max_age_days, workers=8, search_limit=-1, debug=False, stats=None, cache=None, skip=None, on_done=None):
+    # Runs the per-subreddit network lookups on a bounded thread pool. At most
+    # 2 * workers candidates are in flight and results are yielded in the
+    # order the candidates came out of the discovery generator. on_done is
+    # called in that same order for every candidate, including rejected and
+    # skipped ones.
+    pending = deque()
+    checked = 0
+
+    def finish(entry):
+        # on_done runs after the consumer has handled the row, so a
+        # checkpoint never gets ahead of the output.
+        sub, future = entry
+        row = future.result() if future is not None else None
+        if row is not None:
+            yield row
+        if on_done is not None:
+            on_done(sub, row)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for sub in subs:
+            checked += 1
+            if search_limit != -1 and checked > search_limit:
+                print(f'Reached search limit of {search_limit}. Stopping.')
+                break
+            if skip and sub.display_name in skip:
+                pending.append((sub, None))
+            else:
+                pending.append((sub, executor.submit(build_row, sub, keyword, min_subs, max_subs, max_age_days, debug, stats, cache)))
+            while len(pending) >= 2 * max(1, workers):
+                yield from finish(pending.popleft())
+        while pending:
+            yield from finish(pending.popleft())
+
+def index_row(data, matcher=None):
+    row = {
+        'Title': data['display_name'],
+        'Total Users': data['subscribers'],
+        'Description': data['public_description'],
+        'Link': f"https://www.reddit.com/r/{data['display_name']}/",
+    }
+    if matcher is not None:
+        row['Keywords'] = ', '.join(matcher.matched(f"{data['title'] or ''}\n{data['public_description'] or ''}"))
+    return row
+
+def layout_rows(row, layout):
+    # The sheets layout writes a subreddit once for every keyword it matched,
+    # tagged with that keyword so the xlsx sink can give each keyword a sheet.
+    if layout != 'sheets':
+        yield row
+        return
+    for keyword in row['Keywords'].split(', '):
+        yield dict(row, Keyword=keyword)
+
+def build_index(index, cache=None, search_limit=-1, debug=False):
+    checked = 0
+    subs = hydrate_subreddits(fetch_all_subreddits(debug=debug, cache=cache, index=index), cache=cache, index=index, debug=debug)
+    try:
+        for sub in subs:
+            checked += 1
+            if search_limit != -1 and checked >= search_limit:
+                print(f'Reached search limit of {search_limit}. Stopping.')
+                break
+    finally:
+        subs.close()
+    print(f'Index now holds {index.count()} subreddits')
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Reddit Subreddit Scraper')
-    parser.add_argument('--keyword', required=True, help='Keyword to search in subreddit title or description')
+    parser.add_argument('--keyword', help='Keyword to search in subreddit title or description')
+    parser.add_argument('--keywords', help='Comma-separated keywords to search for in a single shared crawl')
+    parser.add_argument('--keywords-file', help='File with one keyword per line (lines starting with # are ignored)')
+    parser.add_argument('--batch-layout', choices=['combined', 'sheets'], default='combined', help='With several keywords: one row per subreddit with a Keywords column, or one sheet (xlsx) / Keyword value per keyword')
     parser.add_argument('--min-subs', type=int, default=-1, help='Minimum subscriber count (-1 for no limit)')
     parser.add_argument('--max-subs', type=int, default=-1, help='Maximum subscriber count (-1 for no limit)')
     parser.add_argument('--max-age-days', type=int, default=-1, help='Maximum age in days for the latest post (-1 for no limit)')
-    parser.add_argument('--output', required=True, help='Output Excel file path (.xlsx)')
+    parser.add_argument('--output', help='Output file path (.xlsx, .csv, .jsonl or .parquet)')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted run from its last checkpoint and partial output')
+    parser.add_argument('--checkpoint-every', type=int, default=100, help='Save crawl progress every N processed subreddits')
+    parser.add_argument('--flush-every', type=int, default=50, help='Flush the output to disk every N rows')
+    parser.add_argument('--discovery', choices=['targeted', 'broad'], default='targeted', help='Find candidates by searching for the keywords first (targeted) or by crawling every listed subreddit (broad)')
     parser.add_argument('--search-limit', type=int, default=-1, help='Maximum number of subreddits to process (-1 for no limit)')
+    parser.add_argument('--workers', type=int, default=8, help='Number of subreddits to enrich concurrently')
+    parser.add_argument('--cache-path', default=None, help='SQLite cache file (default: Reddit/reddit_cache.sqlite3)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the local cache')
+    parser.add_argument('--listing-ttl', type=float, default=DEFAULT_TTLS['listing'] / 3600, help='Hours before cached listing data and discovery results expire')
+    parser.add_argument('--post-ttl', type=float, default=DEFAULT_TTLS['latest_post'] / 3600, help='Hours before a cached latest-post time expires')
+    parser.add_argument('--rules-ttl', type=float, default=DEFAULT_TTLS['rules'] / 3600, help='Hours before cached rules expire')
+    parser.add_argument('--online-ttl', type=float, default=DEFAULT_TTLS['online'] / 3600, help='Hours before a cached online count expires')
+    parser.add_argument('--index-path', default=None, help='SQLite search index file (default: Reddit/reddit_index.sqlite3)')
+    parser.add_argument('--build-index', action='store_true', help='Crawl subreddits into the local search index and exit')
+    parser.add_argument('--from-index', action='store_true', help='Take candidates from the local search index instead of crawling Reddit')
+    parser.add_argument('--index-only', action='store_true', help='With --from-index, write index matches without fetching posts, rules or online counts')
+    parser.add_argument('--api-rpm', type=float, default=100, help='Maximum Reddit API requests per minute')
+    parser.add_argument('--html-rpm', type=float, default=30, help='Maximum subreddit page requests per minute for online counts')
+    add_metrics_args(parser)
     parser.add_argument('--debug', action='store_true', help='Enable debug output')
-    return parser.parse_args()
+    args = parser.parse_args()
+    args.keyword_list = load_keywords(args.keywords, args.keywords_file)
+    if args.keyword and args.keyword_list:
+        parser.error('use either --keyword or --keywords/--keywords-file, not both')
+    if not args.build_index and not ((args.keyword or args.keyword_list) and args.output):
+        parser.error('--keyword (or --keywords/--keywords-file) and --output are required unless --build-index is given')
+    if args.index_only and not args.from_index:
+        parser.error('--index-only requires --from-index')
+    return args
 
-def main():
-    args = parse_args()
-    checked = 0
+def run(args):
     print('Starting subreddit search...')
-    fieldnames = ['Title', 'Total Users', 'Online Users', 'Online Ratio', 'Description', 'Link', 'Kurallar']
-    rows = []
-    for sub in fetch_all_subreddits(debug=args.debug):
-        checked += 1
-        if args.search_limit != -1 and checked > args.search_limit:
-            print(f'Reached search limit of {args.search_limit}. Stopping.')
-            break
-        if args.debug:
-            print(f'Checking subreddit: {sub.display_name}')
-        if filter_subreddit(sub, args.keyword, args.min_subs, args.max_subs, args.max_age_days, debug=args.debug):
-            if args.debug:
-                print(f'  -> PASSED: {sub.display_name}')
-            row = get_subreddit_data(sub, debug=args.debug)
-            online_users = get_online_users_requests(row['Link'])
-            row['Online Users'] = online_users
-            try:
-                total = int(row['Total Users'])
-                online = int(online_users) if online_users else 0
-                ratio = f"{(online/total*100):.2f}%" if total > 0 else ''
-            except Exception:
-                ratio = ''
-            row['Online Ratio'] = ratio
-            row.pop('Active Users', None)
-            rows.append(row)
-        elif args.debug:
-            print(f'  -> FAILED: {sub.display_name}')
-    # Write to Excel
-    workbook = xlsxwriter.Workbook(args.output)
-    worksheet = workbook.add_worksheet()
-    # Write header
-    for col, name in enumerate(fieldnames):
-        worksheet.write(0, col, name)
-    # Write data
-    for row_idx, row in enumerate(rows, 1):
-        for col, key in enumerate(fieldnames):
-            if key == 'Link' and row.get('Link'):
-                worksheet.write_url(row_idx, col, row['Link'], string=row['Link'])
+    fieldnames = list(REDDIT_COLUMNS)
+    keyword = args.keyword
+    layout = None
+    sheet_field = None
+    if args.keyword_list:
+        # All keywords are matched against the same crawl in one pass.
+        keyword = KeywordMatcher(args.keyword_list)
+        layout = args.batch_layout
+        if layout == 'sheets':
+            fieldnames.append('Keyword')
+            sheet_field = 'Keyword'
+        else:
+            fieldnames.append('Keywords')
+        print(f"Searching for {len(keyword.keywords)} keywords: {', '.join(keyword.keywords)}")
+    stats = FilterStats()
+    scheduler = get_scheduler()
+    scheduler.set_rate('oauth.reddit.com', args.api_rpm / 60)
+    scheduler.set_rate('www.reddit.com', args.html_rpm / 60)
+    get_session(pool_size=max(args.workers, 1))
+    cache = None
+    index = None
+    try:
+        if not args.no_cache:
+            cache = SubredditCache(args.cache_path, ttls={
+                'discovery': args.listing_ttl * 3600,
+                'listing': args.listing_ttl * 3600,
+                'latest_post': args.post_ttl * 3600,
+                'rules': args.rules_ttl * 3600,
+                'online': args.online_ttl * 3600,
+            })
+        index = SubredditIndex(args.index_path)
+        if args.build_index:
+            build_index(index, cache=cache, search_limit=args.search_limit, debug=args.debug)
+            return
+        with open_sink(args.output, fieldnames, resume=args.resume, flush_every=args.flush_every, sheet_field=sheet_field, columns=REDDIT_COLUMNS) as sink:
+            if sink.rows_written:
+                print(f'Resuming {args.output} with {sink.rows_written} rows already written')
+            if args.index_only:
+                if layout is None:
+                    found = index.query(keyword, args.min_subs, args.max_subs, args.search_limit)
+                else:
+                    found = index.query_any(keyword.keywords, args.min_subs, args.max_subs, args.search_limit)
+                rows = [index_row(data, keyword if layout else None) for data in found]
+                rows = [row for row in rows if row['Link'] not in sink.existing_keys]
+                for row in export_rows(result_frame(rows, REDDIT_COLUMNS), formatted=not sink.typed):
+                    sink.write_many(layout_rows(row, layout))
             else:
-                worksheet.write(row_idx, col, row.get(key, ''))
-    workbook.close()
-    print(f'Successfully wrote subreddits to {args.output}')
+                checkpoint = None
+                discovery = None
+                pending = []
+
+                def write_pending():
+                    # Rows are typed, given their ratios and formatted a batch at
+                    # a time; the checkpoint writes them out before it saves.
+                    if pending:
+                        for row in export_rows(result_frame(pending, REDDIT_COLUMNS), formatted=not sink.typed):
+                            sink.write_many(layout_rows(row, layout))
+                        pending.clear()
+
+                def flush_output():
+                    write_pending()
+                    sink.flush()
+
+                if args.from_index:
+                    subs = subreddits_from_index(index, keyword, args.min_subs, args.max_subs)
+                else:
+                    checkpoint_path = get_checkpoint_path(args.output)
+                    if args.resume:
+                        checkpoint = CrawlCheckpoint.load(checkpoint_path, save_every=args.checkpoint_every, before_save=flush_output)
+                        if checkpoint.checked:
+                            print(f'Resuming crawl after {checkpoint.checked} checked subreddits')
+                    else:
+                        checkpoint = CrawlCheckpoint(checkpoint_path, save_every=args.checkpoint_every, before_save=flush_output)
+                    discovery = DiscoveryStats.load(cache)
+                    subs = get_metrics().timed_iter('discovery', fetch_all_subreddits(
+                        debug=args.debug,
+                        cache=cache,
+                        index=index,
+                        checkpoint=checkpoint,
+                        keyword=keyword if args.discovery == 'targeted' else None,
+                        stats=discovery
+                    ))
+                    subs = hydrate_subreddits(subs, cache=cache, index=index, debug=args.debug)
+                search_limit = args.search_limit
+                if checkpoint is not None and search_limit != -1:
+                    search_limit = max(0, search_limit - checkpoint.checked)
+                done = {subreddit_name_from_url(link) for link in sink.existing_keys if link}
+
+                def on_done(sub, row):
+                    if discovery is not None:
+                        discovery.result(sub.display_name, row is not None)
+                    if checkpoint is not None:
+                        checkpoint.done(sub.display_name, sink.rows_written + len(pending))
+                rows = enrich_subreddits(
+                    subs,
+                    keyword,
+                    args.min_subs,
+                    args.max_subs,
+                    args.max_age_days,
+                    workers=args.workers,
+                    search_limit=search_limit,
+                    debug=args.debug,
+                    stats=stats,
+                    cache=cache,
+                    skip=done,
+                    on_done=on_done
+                )
+                try:
+                    for row in rows:
+                        pending.append(row)
+                        if len(pending) >= args.flush_every:
+                            write_pending()
+                    write_pending()
+                except BaseException:
+                    if checkpoint is not None:
+                        checkpoint.save()
+                        print(f'Progress saved to {checkpoint.path}, rerun with --resume to continue')
+                    else:
+                        write_pending()
+                    raise
+                finally:
+                    # Finish the generators now, while the cache and index they
+                    # write to on exit are still open.
+                    rows.close()
+                    subs.close()
+                    if discovery is not None:
+                        discovery.save(cache)
+                if checkpoint is not None:
+                    checkpoint.remove()
+                print(stats.summary())
+                if discovery is not None:
+                    api_requests = scheduler.utilization().get('oauth.reddit.com', {}).get('requests')
+                    print(discovery.summary(api_requests))
+    finally:
+        # Closing the connections also checkpoints their WAL files, on
+        # every exit path.
+        if index is not None:
+            index.close()
+        if cache is not None:
+            cache.close()
+    print(scheduler.summary())
+    print(f'Successfully wrote {sink.rows_written} subreddits to {args.output}')
+
+def main():
+    run_instrumented(parse_args(), run)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
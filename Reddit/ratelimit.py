@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+import prawcore
+import requests
+
+# Requests per second allowed per host before any rate-limit headers have been
+# seen. Reddit allows OAuth clients 100 requests per minute; HTML pages are not
+# covered by that budget and get a more conservative default.
+DEFAULT_RATES = {
+    'oauth.reddit.com': 100 / 60,
+    'www.reddit.com': 30 / 60,
+}
+FALLBACK_RATE = 1.0
+MAX_BACKOFF = 120.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate * 5)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        # Takes a token and returns how long the caller has to wait for it.
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RequestScheduler:
+    def __init__(self, rates=None):
+        self.rates = dict(DEFAULT_RATES)
+        self.rates.update(rates or {})
+        self._buckets = {}
+        self._blocked_until = {}
+        self._limits = {}
+        self._recent = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def set_rate(self, host, rate):
+        with self._lock:
+            self.rates[host] = rate
+            self._buckets.pop(host, None)
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rates.get(host, FALLBACK_RATE))
+        return bucket
+
+    def _counts_for(self, host):
+        return self._counts.setdefault(host, {'requests': 0, 'throttled': 0, 'waited': 0.0})
+
+    def acquire(self, host):
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._bucket(host).reserve(), self._blocked_until.get(host, 0) - now, 0.0)
+            counts = self._counts_for(host)
+            counts['requests'] += 1
+            counts['waited'] += wait
+            self._recent.setdefault(host, deque()).append(now + wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    def update(self, host, headers, status=None):
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        with self._lock:
+            if remaining is not None and reset is not None:
+                remaining = float(remaining)
+                reset = max(float(reset), 1.0)
+                self._limits[host] = {'remaining': remaining, 'reset': reset}
+                if remaining < 1:
+                    self._blocked_until[host] = time.monotonic() + reset
+                else:
+                    # Spread what is left of the window evenly over the time
+                    # until it resets, never going above the configured rate.
+                    self._bucket(host).rate = min(self.rates.get(host, FALLBACK_RATE), remaining / reset)
+            if status == 429:
+                self._counts_for(host)['throttled'] += 1
+        if status == 429:
+            retry_after = headers.get('retry-after')
+            self.backoff(host, 0, float(retry_after) if retry_after else None)
+
+    def backoff(self, host, attempt, retry_after=None):
+        # Exponential backoff with full jitter; Retry-After wins when given.
+        # The next acquire() for the host waits until the delay has passed.
+        delay = retry_after if retry_after is not None else random.uniform(0, min(MAX_BACKOFF, 2 ** attempt))
+        with self._lock:
+            self._blocked_until[host] = max(self._blocked_until.get(host, 0), time.monotonic() + delay)
+        return delay
+
+    def utilization(self):
+        now = time.monotonic()
+        report = {}
+        with self._lock:
+            for host, recent in self._recent.items():
+                while recent and recent[0] < now - 60:
+                    recent.popleft()
+                rate = self._bucket(host).rate
+                counts = self._counts.get(host, {})
+                report[host] = {
+                    'requests_last_minute': len(recent),
+                    'allowed_per_minute': rate * 60,
+                    'utilization': len(recent) / (rate * 60) if rate else 0.0,
+                    'requests': counts.get('requests', 0),
+                    'throttled': counts.get('throttled', 0),
+                    'waited_seconds': counts.get('waited', 0.0),
+                    'remaining': self._limits.get(host, {}).get('remaining'),
+                    'reset': self._limits.get(host, {}).get('reset'),
+                }
+        return report
+
+    def summary(self):
+        lines = []
+        for host, usage in sorted(self.utilization().items()):
+            lines.append(
+                f"{host}: {usage['requests']} requests, {usage['throttled']} throttled, "
+                f"{usage['waited_seconds']:.1f}s waiting, {usage['utilization']:.0%} of allowed rate in the last minute"
+            )
+        return '\n'.join(lines)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+def scheduled_get(url, max_retries=3, session=None, **kwargs):
+    scheduler = get_scheduler()
+    host = host_of(url)
+    for attempt in range(max_retries + 1):
+        scheduler.acquire(host)
+        resp = (session or requests).get(url, **kwargs)
+        scheduler.update(host, resp.headers, resp.status_code)
+        if resp.status_code not in RETRY_STATUSES or attempt == max_retries:
+            return resp
+        scheduler.backoff(host, attempt + 1)
+
+
+class ScheduledRequestor(prawcore.Requestor):
+    # Routes every PRAW request, including token requests, through the shared
+    # scheduler so API calls and HTML fetches draw from the same budgets.
+    def request(self, *args, **kwargs):
+        url = args[1] if len(args) > 1 else kwargs.get('url')
+        host = host_of(url)
+        scheduler = get_scheduler()
+        scheduler.acquire(host)
+        resp = super().request(*args, **kwargs)
+        scheduler.update(host, resp.headers, resp.status_code)
+        return resp
@@ -1,11 +1,30 @@
+import threading
 import praw
 from Reddit.config import get_credentials
+from Reddit.ratelimit import ScheduledRequestor
+
+# Replaces the saved credentials when set, e.g. by the offline benchmarks to
+# point PRAW at a local server through oauth_url/reddit_url.
+_client_settings = None
+_local = threading.local()
+
+def set_client_settings(settings):
+    global _client_settings
+    _client_settings = settings
 
 def get_reddit_client():
-    creds = get_credentials()
+    creds = _client_settings or get_credentials()
     reddit = praw.Reddit(
-        client_id=creds['client_id'],
-        client_secret=creds['client_secret'],
-        user_agent=creds['user_agent']
+        **creds,
+        requestor_class=ScheduledRequestor
     )
-    return reddit 
\ No newline at end of file
+    return reddit
+
+def get_thread_reddit_client():
+    # A praw.Reddit instance and its session are not thread-safe (token
+    # refresh and rate-limit state are updated without locks), so every
+    # worker thread gets a client of its own.
+    reddit = getattr(_local, 'reddit', None)
+    if reddit is None:
+        reddit = _local.reddit = get_reddit_client()
+    return reddit
@@ -1,88 +1,452 @@
-import time
+import threading
+from collections import Counter
 from datetime import datetime, timezone, timedelta
+from praw.models import Subreddit
+from prawcore.exceptions import Forbidden, NotFound, Redirect, UnavailableForLegalReasons
+from Reddit.cache import listing_data
+from Reddit.keywords import keyword_expansions
 from Reddit.reddit_client import get_reddit_client
+from metrics import get_metrics
 
 
-def fetch_all_subreddits(debug=False):
-    reddit = get_reddit_client()
-    seen = set()
+DISCOVERY_KEY = '__discovery__'
+# What PRAW raises when a lazy subreddit turns out to be banned, private or
+# nonexistent as its about page is fetched.
+UNAVAILABLE_ERRORS = (Forbidden, NotFound, Redirect, UnavailableForLegalReasons)
+
+
+def _remember(cache, index, sub):
+    if cache is None and index is None:
+        return
+    if needs_hydration(sub):
+        # Name-only results (search_by_name) are stored once hydrate_subreddits
+        # has fetched their data.
+        return
+    _store_listing(cache, index, sub)
+
+def _store_listing(cache, index, sub):
+    data = listing_data(sub)
+    if cache is not None:
+        cache.set(sub.display_name, 'listing', data)
+    if index is not None:
+        index.add(sub.display_name, data.get('title'), data.get('public_description'), data.get('subscribers'))
+
+def needs_hydration(sub):
+    # Listing results carry the subscriber count; lazy objects created from a
+    # bare name do not and would fetch their about page on first use.
+    return 'subscribers' not in vars(sub)
+
+# Crawl positions are (source index, cursor). The cache replay comes first as
+# REPLAY_SOURCE with an offset into the cached names; live sources use the
+# PRAW "after" cursor of the listing page the subreddit came from.
+REPLAY_SOURCE = -1
+
+def _replay_discovery(reddit, cache, index, names, offset=0, debug=False):
+    if debug:
+        print(f'Replaying {len(names) - offset} subreddits from cache')
+    for position in range(offset, len(names)):
+        name = names[position]
+        data = cache.get(name, 'listing')
+        if data and index is not None:
+            index.add(name, data.get('title'), data.get('public_description'), data.get('subscribers'))
+        yield (Subreddit(reddit, _data=data) if data else reddit.subreddit(name)), position
+
+def _iter_listing(listing, query, after, on_request=None):
+    params = {'after': after} if after else {}
+    generator = listing(query, limit=None, params=params) if query is not None else listing(limit=None, params=params)
+    # Every page is requested through ListingGenerator._next_batch, which
+    # then moves params['after'] on (except on the last page). Wrapping it
+    # counts each request, an empty last page included, and records the
+    # cursor the request was made with: the page a subreddit came from.
+    next_batch = generator._next_batch
+    page_after = after
+
+    def fetch_page():
+        nonlocal page_after
+        if not generator._exhausted:
+            page_after = generator.params.get('after')
+            if on_request is not None:
+                on_request()
+        next_batch()
+
+    generator._next_batch = fetch_page
+    for sub in generator:
+        yield sub, page_after
+
+def _iter_names(reddit, query, on_request=None):
+    # One request returning matching subreddit names; it has no pages to resume.
+    if on_request is not None:
+        on_request()
+    for sub in reddit.subreddits.search_by_name(query, include_nsfw=True):
+        yield sub, None
+
+def _broad_sources(reddit):
     sources = [
-        (reddit.subreddits.popular, 'popular'),
-        (reddit.subreddits.new, 'new'),
-        (reddit.subreddits.default, 'default'),
-        (reddit.subreddits.search, 'search'),
+        ('popular', 'popular', lambda after, on_request: _iter_listing(reddit.subreddits.popular, None, after, on_request)),
+        ('new', 'new', lambda after, on_request: _iter_listing(reddit.subreddits.new, None, after, on_request)),
+        ('default', 'default', lambda after, on_request: _iter_listing(reddit.subreddits.default, None, after, on_request)),
     ]
-    for listing, name in sources:
-        if debug:
-            print(f'Fetching subreddits from: {name}')
-        if listing == reddit.subreddits.search:
-            queries = ['a', 'e', 'i', 'o', 'u']
-            for q in queries:
-                if debug:
-                    print(f'  Searching with query: {q}')
-                for sub in listing(q, limit=None):
-                    if sub.display_name not in seen:
-                        seen.add(sub.display_name)
-                        yield sub
+    return sources
+
+def _vowel_sources(reddit):
+    return [
+        (f'search:{q}', 'vowel_search', lambda after, on_request, q=q: _iter_listing(reddit.subreddits.search, q, after, on_request))
+        for q in ['a', 'e', 'i', 'o', 'u']
+    ]
+
+def _keyword_sources(reddit, terms):
+    sources = []
+    expansions = []
+    for term in terms:
+        sources.append((f'search_by_name:{term}', 'search_by_name', lambda after, on_request, q=term: _iter_names(reddit, q, on_request)))
+        sources.append((f'search:{term}', 'search', lambda after, on_request, q=term: _iter_listing(reddit.subreddits.search, q, after, on_request)))
+        for expansion in keyword_expansions(term):
+            if expansion not in terms and expansion not in expansions:
+                expansions.append(expansion)
+    for term in expansions:
+        sources.append((f'search_by_name:{term}', 'expansion_search_by_name', lambda after, on_request, q=term: _iter_names(reddit, q, on_request)))
+        sources.append((f'search:{term}', 'expansion_search', lambda after, on_request, q=term: _iter_listing(reddit.subreddits.search, q, after, on_request)))
+    return sources
+
+def _discovery_sources(reddit, terms=None, stats=None, order=None):
+    # Without keywords every subreddit Reddit lists is crawled in a fixed
+    # order. With keywords, searches for them and their expansions come first
+    # and the broad listings are only a fallback; sources are ordered by the
+    # matches per request they produced in earlier runs. order (from a
+    # checkpoint) pins the order a resumed crawl started with.
+    if not terms:
+        return _broad_sources(reddit) + _vowel_sources(reddit)
+    sources = _keyword_sources(reddit, terms) + _broad_sources(reddit)
+    if order:
+        position = {label: i for i, label in enumerate(order)}
+        sources.sort(key=lambda source: position.get(source[0], len(position)))
+    elif stats is not None:
+        sources.sort(key=lambda source: -stats.expected_yield(source[1]))
+    return sources
+
+def _search_terms(keyword):
+    if keyword is None:
+        return []
+    return [keyword.lower()] if isinstance(keyword, str) else list(keyword.keywords)
+
+def fetch_all_subreddits(debug=False, cache=None, index=None, checkpoint=None, keyword=None, stats=None):
+    reddit = get_reddit_client()
+    terms = _search_terms(keyword)
+    discovery_key = DISCOVERY_KEY + (':' + '|'.join(sorted(terms)) if terms else '')
+    cached = cache.get(discovery_key, 'discovery') if cache is not None else None
+    discovered = list(cached['names']) if cached else []
+    replayed = len(discovered)
+    known = set(discovered)
+    seen = set(known)
+    done = set()
+    start_source, start_after = REPLAY_SOURCE, None
+    order = None
+    if checkpoint is not None:
+        done = checkpoint.seen
+        start_source, start_after = checkpoint.source_index, checkpoint.after
+        order = checkpoint.sources
+        if start_source == REPLAY_SOURCE:
+            seen |= done
         else:
-            for sub in listing(limit=None):
+            # The cached names include candidates that were discovered but
+            # still in flight when the run stopped; the crawl resumes before
+            # them, so only subreddits that were processed are skipped.
+            seen = set(done)
+    sources = _discovery_sources(reddit, terms, stats, order)
+    if checkpoint is not None:
+        checkpoint.sources = [label for label, kind, fetch in sources]
+    complete = False
+    # (source label, page cursor) of the last newly discovered subreddit,
+    # saved with the names so an incomplete crawl can continue from there.
+    position = None
+    try:
+        if cached and start_source == REPLAY_SOURCE:
+            for sub, position in _replay_discovery(reddit, cache, index, cached['names'], start_after or 0, debug):
+                if sub.display_name in done:
+                    continue
+                if checkpoint is not None:
+                    checkpoint.note(sub.display_name, REPLAY_SOURCE, position)
+                if stats is not None:
+                    stats.found('cache', sub.display_name)
+                yield sub
+            if cached['complete']:
+                return
+            # Continue the crawl where the cached one stopped instead of
+            # fetching every listing page it already went through again.
+            labels = [label for label, kind, fetch in sources]
+            if cached.get('source') in labels:
+                start_source, start_after = labels.index(cached['source']), cached.get('after')
+                position = (cached['source'], start_after)
+        for source_index, (label, kind, fetch) in enumerate(sources):
+            if source_index < start_source:
+                continue
+            if debug:
+                print(f'Fetching subreddits from: {label}')
+            after = start_after if source_index == start_source else None
+            on_request = (lambda kind=kind: stats.request(kind)) if stats is not None else None
+            for sub, page_after in fetch(after, on_request):
                 if sub.display_name not in seen:
                     seen.add(sub.display_name)
+                    if sub.display_name not in known:
+                        known.add(sub.display_name)
+                        discovered.append(sub.display_name)
+                        position = (label, page_after)
+                    _remember(cache, index, sub)
+                    if checkpoint is not None:
+                        checkpoint.note(sub.display_name, source_index, page_after)
+                    if stats is not None:
+                        stats.found(kind, sub.display_name)
                     yield sub
+        complete = True
+    finally:
+        # Also saved when the consumer stops early, so the next run replays
+        # what was found and only crawls past it.
+        if cache is not None and (complete or len(discovered) > replayed):
+            entry = {'names': discovered, 'complete': complete}
+            if not complete and position is not None:
+                entry['source'], entry['after'] = position
+            cache.set(discovery_key, 'discovery', entry)
+        if index is not None:
+            index.flush()
+
+# /api/info accepts up to 100 subreddit names per request.
+INFO_BATCH_SIZE = 100
+
+def _hydrate(reddit, lazy, cache, index, debug):
+    names = [sub.display_name for sub in lazy]
+    metrics = get_metrics()
+    with metrics.time('hydrate'):
+        fetched = {sub.display_name.lower(): sub for sub in reddit.info(subreddits=names)}
+    metrics.count('hydrate', 'requested', len(names))
+    metrics.count('hydrate', 'found', len(fetched))
+    metrics.count('hydrate', 'missing', len(names) - len(fetched))
+    if debug:
+        print(f'Fetched about data for {len(fetched)} of {len(names)} subreddits in one request')
+    for sub in fetched.values():
+        _store_listing(cache, index, sub)
+    return fetched
+
+def hydrate_subreddits(subs, batch_size=INFO_BATCH_SIZE, cache=None, index=None, debug=False):
+    # Lazy subreddits are collected and fetched batch_size at a time through
+    # /api/info instead of one about request each when a filter first reads
+    # them. Subreddits are yielded in their original order; names /api/info
+    # does not return (banned, private, nonexistent) are dropped, as reading
+    # any of their data would fail.
+    reddit = get_reddit_client()
+    pending = []
+    lazy = []
+
+    def release():
+        fetched = _hydrate(reddit, lazy, cache, index, debug) if lazy else {}
+        for sub in pending:
+            if not needs_hydration(sub):
+                yield sub
+            elif sub.display_name.lower() in fetched:
+                yield fetched[sub.display_name.lower()]
+            elif debug:
+                print(f'    Dropped unavailable subreddit: {sub.display_name}')
+        pending.clear()
+        lazy.clear()
 
-def filter_subreddit(sub, keyword, min_subs, max_subs, max_age_days, debug=False):
-    keyword = keyword.lower()
-    title = (sub.title or '').lower()
-    desc = (sub.public_description or '').lower()
-    if keyword not in title and keyword not in desc:
-        if debug:
-            print(f'    Filtered out by keyword: {sub.display_name}')
-        return False
-    if min_subs != -1 and sub.subscribers < min_subs:
-        if debug:
-            print(f'    Filtered out by min_subs: {sub.display_name} ({sub.subscribers})')
-        return False
-    if max_subs != -1 and sub.subscribers > max_subs:
-        if debug:
-            print(f'    Filtered out by max_subs: {sub.display_name} ({sub.subscribers})')
-        return False
     try:
+        for sub in subs:
+            if not lazy and not needs_hydration(sub):
+                yield sub
+                continue
+            pending.append(sub)
+            if needs_hydration(sub):
+                lazy.append(sub)
+            # A short batch goes out as soon as the listing results waiting
+            # behind the lazy names outnumber them, so a burst of name-only
+            # results does not hold back the candidates that follow it.
+            if len(lazy) >= batch_size or len(pending) - len(lazy) > len(lazy):
+                yield from release()
+        yield from release()
+    finally:
+        if index is not None:
+            index.flush()
+
+def subreddits_from_index(index, keyword, min_subs=-1, max_subs=-1, limit=-1):
+    reddit = get_reddit_client()
+    if isinstance(keyword, str) or keyword is None:
+        found = index.query(keyword, min_subs, max_subs, limit)
+    else:
+        found = index.query_any(keyword.keywords, min_subs, max_subs, limit)
+    for data in found:
+        yield Subreddit(reddit, _data=data)
+
+# Filter predicates are evaluated cheapest first so that most candidates are
+# rejected before any request is made for them.
+COST_LOCAL = 0      # string match on data we already hold
+COST_LISTING = 1    # field normally provided by the listing response
+COST_API = 2        # needs an extra Reddit API call
+
+
+class FilterStats:
+    def __init__(self):
+        self.checked = 0
+        self.passed = 0
+        self.rejections = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, reason):
+        with self._lock:
+            self.checked += 1
+            if reason is None:
+                self.passed += 1
+            else:
+                self.rejections[reason] += 1
+
+    def summary(self):
+        lines = [f'Checked {self.checked} subreddits, {self.passed} passed']
+        for reason, count in self.rejections.most_common():
+            lines.append(f'  rejected by {reason}: {count}')
+        return '\n'.join(lines)
+
+
+def listing_attr(sub, name, fetch=True):
+    # Reading an attribute that a lazy PRAW Subreddit does not hold yet makes
+    # PRAW fetch the whole about page, so prefer what the listing provided.
+    # With fetch=False a missing attribute is simply None.
+    value = vars(sub).get(name)
+    if value is None and fetch:
+        value = getattr(sub, name, None)
+    return value
+
+def keyword_text(sub):
+    return f"{listing_attr(sub, 'title') or ''}\n{listing_attr(sub, 'public_description') or ''}"
+
+def _check_keyword(keyword):
+    # keyword is either one lower-cased string or a KeywordMatcher for a
+    # batch of keywords, which checks all of them in a single pass.
+    if isinstance(keyword, str):
+        matches = lambda text: keyword in text.lower()
+    else:
+        matches = keyword.matches
+    def check(sub, debug):
+        if not matches(keyword_text(sub)):
+            if debug:
+                print(f'    Filtered out by keyword: {sub.display_name}')
+            return 'keyword'
+        return None
+    return check
+
+def _check_min_subs(min_subs):
+    def check(sub, debug):
+        subscribers = listing_attr(sub, 'subscribers') or 0
+        if subscribers < min_subs:
+            if debug:
+                print(f'    Filtered out by min_subs: {sub.display_name} ({subscribers})')
+            return 'min_subs'
+        return None
+    return check
+
+def _check_max_subs(max_subs):
+    def check(sub, debug):
+        subscribers = listing_attr(sub, 'subscribers') or 0
+        if subscribers > max_subs:
+            if debug:
+                print(f'    Filtered out by max_subs: {sub.display_name} ({subscribers})')
+            return 'max_subs'
+        return None
+    return check
+
+def _latest_post_time(sub, cache):
+    metrics = get_metrics()
+    if cache is not None:
+        cached = cache.get(sub.display_name, 'latest_post')
+        metrics.cache('latest_post', cached is not None)
+        if cached is not None:
+            return cached['created_utc']
+    with metrics.time('latest_post'):
         posts = list(sub.new(limit=1))
-        if not posts:
+    created_utc = posts[0].created_utc if posts else None
+    if cache is not None:
+        cache.set(sub.display_name, 'latest_post', {'created_utc': created_utc})
+    return created_utc
+
+def _check_latest_post(max_age_days, cache):
+    def check(sub, debug):
+        try:
+            created_utc = _latest_post_time(sub, cache)
+            if created_utc is None:
+                if debug:
+                    print(f'    Filtered out (no posts): {sub.display_name}')
+                return 'no_posts'
+            post_time = datetime.fromtimestamp(created_utc, tz=timezone.utc)
+            age_days = (datetime.now(timezone.utc) - post_time).days
+            if age_days > max_age_days:
+                if debug:
+                    print(f'    Filtered out by max_age_days: {sub.display_name} (latest post {age_days} days ago)')
+                return 'max_age_days'
+        except Exception as e:
             if debug:
-                print(f'    Filtered out (no posts): {sub.display_name}')
-            return False
-        latest_post = posts[0]
-        post_time = datetime.fromtimestamp(latest_post.created_utc, tz=timezone.utc)
-        age_days = (datetime.now(timezone.utc) - post_time).days
-        if max_age_days != -1 and age_days > max_age_days:
+                print(f'    Exception while checking posts for {sub.display_name}: {e}')
+            return 'post_error'
+        return None
+    return check
+
+def build_predicates(keyword, min_subs, max_subs, max_age_days, cache=None):
+    # Only predicates whose result can change the outcome are built, so a
+    # disabled limit never costs a request.
+    predicates = []
+    if keyword:
+        predicates.append((COST_LOCAL, 'keyword', _check_keyword(keyword.lower() if isinstance(keyword, str) else keyword)))
+    if min_subs != -1:
+        predicates.append((COST_LISTING, 'min_subs', _check_min_subs(min_subs)))
+    if max_subs != -1:
+        predicates.append((COST_LISTING, 'max_subs', _check_max_subs(max_subs)))
+    if max_age_days != -1:
+        predicates.append((COST_API, 'max_age_days', _check_latest_post(max_age_days, cache)))
+    predicates.sort(key=lambda predicate: predicate[0])
+    return predicates
+
+def filter_subreddit(sub, keyword, min_subs, max_subs, max_age_days, debug=False, stats=None, cache=None):
+    reason = None
+    metrics = get_metrics()
+    with metrics.time('filter'):
+        try:
+            for cost, name, check in build_predicates(keyword, min_subs, max_subs, max_age_days, cache):
+                reason = check(sub, debug)
+                if reason is not None:
+                    break
+        except UNAVAILABLE_ERRORS as e:
             if debug:
-                print(f'    Filtered out by max_age_days: {sub.display_name} (latest post {age_days} days ago)')
-            return False
-    except Exception as e:
-        if debug:
-            print(f'    Exception while checking posts for {sub.display_name}: {e}')
-        return False
-    return True
-
-def get_subreddit_data(sub, debug=False):
+                print(f'    Filtered out (unavailable): {sub.display_name} ({e})')
+            reason = 'unavailable'
+    metrics.count('filter', reason or 'passed')
+    if stats is not None:
+        stats.record(reason)
+    return reason is None
+
+def get_subreddit_data(sub, debug=False, cache=None):
     # Fetch rules (use list(sub.rules) as per PRAW docs)
-    rules_text = ''
-    try:
-        rules = list(sub.rules)
-        rules_text = '\n'.join([f"{rule.short_name}: {rule.description}" for rule in rules])
-        if debug:
-            print(f"    Fetched {len(rules)} rules for {sub.display_name}")
-    except Exception as e:
-        if debug:
-            print(f"    Could not fetch rules for {sub.display_name}: {e}")
-        rules_text = ''
+    metrics = get_metrics()
+    rules_text = cache.get(sub.display_name, 'rules') if cache is not None else None
+    if cache is not None:
+        metrics.cache('rules', rules_text is not None)
+    if rules_text is None:
+        try:
+            with metrics.time('rules'):
+                rules = list(sub.rules)
+            rules_text = '\n'.join([f"{rule.short_name}: {rule.description}" for rule in rules])
+            if cache is not None:
+                cache.set(sub.display_name, 'rules', rules_text)
+            if debug:
+                print(f"    Fetched {len(rules)} rules for {sub.display_name}")
+        except Exception as e:
+            if debug:
+                print(f"    Could not fetch rules for {sub.display_name}: {e}")
+            rules_text = ''
+    elif debug:
+        print(f"    Using cached rules for {sub.display_name}")
     # Calculate active user ratio (use sub.active_user_count if available)
-    total = getattr(sub, 'subscribers', 0) or 0
-    active = getattr(sub, 'active_user_count', None)
+    total = listing_attr(sub, 'subscribers') or 0
+    # Active counts are optional and not worth an about request of their own.
+    active = listing_attr(sub, 'active_user_count', fetch=False)
     if active is None:
         # Try accounts_active as fallback
-        active = getattr(sub, 'accounts_active', None)
+        active = listing_attr(sub, 'accounts_active', fetch=False)
     if active is not None and total > 0:
         ratio = f"{active} ({active/total:.2%})"
     else:
@@ -93,7 +457,7 @@ def get_subreddit_data(sub, debug=False):
         'Title': sub.display_name,
         'Total Users': total,
         'Active Users': ratio,
-        'Description': sub.public_description,
+        'Description': listing_attr(sub, 'public_description'),
         'Link': f'https://www.reddit.com/r/{sub.display_name}/',
         'Kurallar': rules_text
     } 
\ No newline at end of file
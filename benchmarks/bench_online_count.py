@@ -0,0 +1,53 @@
+import argparse
+import os
+import time
+from bs4 import BeautifulSoup
+from Reddit.fetch import extract_online_count
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIXTURES = {
+    'subreddit_online.html': '4821',
+    'subreddit_online_nested.html': '312',
+    'subreddit_no_online.html': '',
+}
+
+def extract_online_count_soup(html):
+    # The full-page BeautifulSoup scan get_online_users_requests used before,
+    # kept here as the baseline.
+    soup = BeautifulSoup(html, 'html.parser')
+    for span in soup.find_all('span'):
+        if 'online' in span.text.lower():
+            faceplate = span.find('faceplate-number')
+            if faceplate and faceplate.has_attr('number'):
+                return faceplate['number']
+    for faceplate in soup.find_all('faceplate-number'):
+        parent = faceplate.find_parent('span')
+        if parent and 'online' in parent.text.lower():
+            return faceplate.get('number') or ''
+    return ''
+
+def time_extractor(extractor, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = extractor(html)
+    return (time.perf_counter() - start) / repeat, result
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark online-count extraction over saved subreddit pages')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per fixture and extractor')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    extractors = [('soup', extract_online_count_soup), ('targeted', extract_online_count)]
+    print(f"{'fixture':32} {'extractor':10} {'ms/page':>10} result")
+    for name, expected in FIXTURES.items():
+        with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+            html = f.read()
+        for label, extractor in extractors:
+            seconds, result = time_extractor(extractor, html, args.repeat)
+            status = 'ok' if result == expected else f'MISMATCH (expected {expected!r})'
+            print(f'{name:32} {label:10} {seconds * 1000:10.2f} {result!r} {status}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fake_server import MATCH_KEYWORD, FakeServer, LocalRedirectAdapter, search_page, subreddit_name
+from Discord.cards import parse_server_cards
+from Discord.discord_server_scraper import iter_discordservers
+from metrics import get_metrics
+from output_sink import ExcelSink
+from praw.models import Subreddit
+from Reddit.cache import listing_data
+from Reddit.fetch import get_session
+from Reddit.main import enrich_subreddits, get_online_users_requests
+from Reddit.ratelimit import get_scheduler, host_of
+from Reddit.reddit_client import get_reddit_client, set_client_settings
+from Reddit.subreddit_scraper import fetch_all_subreddits, filter_subreddit, get_subreddit_data, hydrate_subreddits
+from result_store import REDDIT_COLUMNS
+
+# End-to-end benchmarks that run the real pipelines against
+# benchmarks.fake_server instead of Reddit and discordservers.com. Each
+# scenario reports how many items it handled, the wall time, throughput and
+# the peak Python memory traced while it ran, e.g.
+#   python -m benchmarks.bench_pipeline --subreddits 10000 --cards 10000 --latency-ms 20
+SCENARIOS = ['discovery', 'targeted', 'filter', 'details', 'online', 'enrich', 'discord_http', 'discord_parse', 'excel', 'excel_pandas']
+FIELDNAMES = list(REDDIT_COLUMNS)
+
+
+def point_clients_at(server):
+    # PRAW talks to the fake server through oauth_url/reddit_url; subreddit
+    # pages keep their www.reddit.com links and are redirected by the pooled
+    # session. Both hosts get an effectively unlimited request rate.
+    set_client_settings({
+        'client_id': 'benchmark',
+        'client_secret': 'benchmark',
+        'user_agent': 'zoadyScraper benchmark',
+        'oauth_url': server.url,
+        'reddit_url': server.url,
+        'check_for_updates': False,
+    })
+    get_session().mount('https://www.reddit.com/', LocalRedirectAdapter(server.url))
+    scheduler = get_scheduler()
+    for host in (host_of(server.url), 'www.reddit.com'):
+        scheduler.set_rate(host, 1e9)
+
+def measure(fn, trace_memory=True, quiet=True):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        # The scrapers print progress per item; keep it out of the report.
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            items = fn()
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return {'items': items, 'seconds': seconds, 'per_second': items / seconds if seconds else 0.0, 'peak_mb': peak / 2**20 if peak is not None else None}
+
+def fake_rows(count):
+    return [
+        {
+            'Title': subreddit_name(index),
+            'Total Users': index * 13,
+            'Online Users': str(index % 500),
+            'Online Ratio': '1.00%',
+            'Description': 'A generated subreddit used by the offline benchmarks.',
+            'Link': f'https://www.reddit.com/r/{subreddit_name(index)}/',
+            'Kurallar': 'Rule 1: Be nice.\nRule 2: No spam.',
+        }
+        for index in range(count)
+    ]
+
+
+class Scenarios:
+    def __init__(self, args, server):
+        self.args = args
+        self.server = server
+        self._subs = None
+
+    def subs(self):
+        # Fresh Subreddit objects built from one crawl, fetched outside of any
+        # measurement, so PRAW's per-object caches (e.g. rules) do not carry
+        # over from one scenario to the next.
+        if self._subs is None:
+            self._subs = [listing_data(sub) for sub in self.crawl()]
+        reddit = get_reddit_client()
+        return [Subreddit(reddit, _data=dict(data)) for data in self._subs]
+
+    def crawl(self, keyword=None):
+        subs = hydrate_subreddits(fetch_all_subreddits(keyword=keyword))
+        return [sub for _, sub in zip(range(self.args.subreddits), subs)]
+
+    def discovery(self):
+        return len(self.crawl())
+
+    def targeted(self):
+        return len(self.crawl(MATCH_KEYWORD))
+
+    def filter(self):
+        subs = self.subs()
+        for sub in subs:
+            filter_subreddit(sub, MATCH_KEYWORD, self.args.min_subs, -1, self.args.max_age_days)
+        return len(subs)
+
+    def details(self):
+        with ThreadPoolExecutor(max_workers=self.args.workers) as executor:
+            return sum(1 for _ in executor.map(get_subreddit_data, self.subs()))
+
+    def online(self):
+        urls = [f'https://www.reddit.com/r/{sub.display_name}/' for sub in self.subs()]
+        with ThreadPoolExecutor(max_workers=self.args.workers) as executor:
+            return sum(1 for _ in executor.map(get_online_users_requests, urls))
+
+    def enrich(self):
+        processed = []
+        rows = enrich_subreddits(
+            self.subs(),
+            MATCH_KEYWORD,
+            self.args.min_subs,
+            -1,
+            self.args.max_age_days,
+            workers=self.args.workers,
+            on_done=lambda sub, row: processed.append(sub)
+        )
+        for _ in rows:
+            pass
+        return len(processed)
+
+    def discord_http(self):
+        pages = -(-self.args.cards // 24)
+        servers = iter_discordservers('oyun', max_loads=pages, backend='http', base_url=self.server.url, workers=self.args.workers)
+        return sum(1 for _ in servers)
+
+    def discord_parse(self):
+        html = search_page('oyun', 0, self.args.cards)
+        return len(parse_server_cards(html))
+
+    def excel(self):
+        rows = fake_rows(self.args.subreddits)
+        with tempfile.TemporaryDirectory() as tmp:
+            with ExcelSink(os.path.join(tmp, 'bench.xlsx'), FIELDNAMES) as sink:
+                sink.write_many(rows)
+        return len(rows)
+
+    def excel_pandas(self):
+        # The DataFrame.to_excel export the scrapers used before ExcelSink.
+        import pandas as pd
+        rows = fake_rows(self.args.subreddits)
+        with tempfile.TemporaryDirectory() as tmp:
+            pd.DataFrame(rows, columns=FIELDNAMES).to_excel(os.path.join(tmp, 'bench.xlsx'), index=False)
+        return len(rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers offline against a local fake Reddit/discordservers.com server')
+    parser.add_argument('--subreddits', type=int, default=1000, help='Subreddits served by the fake Reddit API')
+    parser.add_argument('--cards', type=int, default=2400, help='Server cards served by the fake discordservers.com search')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every fake server response')
+    parser.add_argument('--match-every', type=int, default=10, help='Every Nth subreddit mentions the benchmark keyword')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent requests for the enrichment and page scenarios')
+    parser.add_argument('--min-subs', type=int, default=1000, help='min_subs filter used by the filter and enrich scenarios')
+    parser.add_argument('--max-age-days', type=int, default=14, help='max_age_days filter used by the filter and enrich scenarios')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"Comma-separated scenarios to run ({', '.join(SCENARIOS)})")
+    parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc; it slows allocation-heavy scenarios down')
+    parser.add_argument('--stage-metrics', action='store_true', help='Print the per-stage metrics table after each scenario')
+    parser.add_argument('--verbose', action='store_true', help="Show the scrapers' own progress output")
+    parser.add_argument('--json', help='Also write the results to this JSON file, e.g. to compare runs across commits')
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+def main():
+    args = parse_args()
+    results = {}
+    with FakeServer(args.subreddits, args.cards, args.latency_ms / 1000, args.match_every) as server:
+        point_clients_at(server)
+        scenarios = Scenarios(args, server)
+        print(f"{'scenario':14} {'items':>8} {'seconds':>9} {'items/s':>10} {'peak MB':>9}")
+        for name in args.scenarios:
+            if name in ('filter', 'details', 'online', 'enrich'):
+                scenarios.subs()
+            get_metrics().reset()
+            result = measure(getattr(scenarios, name), trace_memory=not args.no_memory, quiet=not args.verbose)
+            results[name] = result
+            peak = f"{result['peak_mb']:9.1f}" if result['peak_mb'] is not None else f"{'-':>9}"
+            print(f"{name:14} {result['items']:8} {result['seconds']:9.2f} {result['per_second']:10.1f} {peak}")
+            if args.stage_metrics:
+                print(get_metrics().summary())
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': {key: value for key, value in vars(args).items() if key != 'json'}, 'results': results}, f, indent=2)
+        print(f'Results written to {args.json}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+import bisect
+import json
+import multiprocessing
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from requests.adapters import HTTPAdapter
+
+# A local stand-in for the Reddit API (OAuth token, subreddit listings and
+# search, /api/info, posts, rules), subreddit pages on www.reddit.com and
+# discordservers.com search pages. The data is generated from a few counts,
+# so any scale can be served without recording it; only the first search
+# page is a saved fixture, so the card parser also sees a recorded page. Every
+# response can be delayed to simulate network latency. It runs in its own process so its
+# CPU time and allocations do not show up in the numbers being measured.
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SUBREDDIT_PAGE = 'subreddit_online.html'
+SEARCH_PAGE = 'discordservers_search.html'
+PAGE_SIZE = 100
+CARDS_PER_PAGE = 24
+NAME_SEARCH_LIMIT = 10
+MATCH_KEYWORD = 'gaming'
+NOW = 1_750_000_000
+
+CARD_TEMPLATE = '''<a href="/server/{id}" class="block">
+  <article role="region" aria-label="server name" class="rounded-lg bg-gray-800 p-4" itemscope itemtype="https://schema.org/Organization">
+    <div class="flex items-center"><img src="/icons/{index}.webp" alt="" width="48" height="48">
+      <p itemprop="name" class="font-bold text-white">{keyword} Sunucusu {index}</p></div>
+    <div itemprop="headline" class="text-gray-300">{keyword} topluluğu #{index} - turnuvalar, etkinlikler ve sohbet.</div>
+    <div class="flex items-center text-sm"><svg width="12" height="12"></svg><span class="pl-2">{members:,} Members</span></div>
+  </article>
+</a>
+'''
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{keyword} - Discord Servers</title></head>
+<body><div id="__next"><main class="container mx-auto">
+<h1>Search results for "{keyword}"</h1>
+<div class="grid grid-cols-1 md:grid-cols-3 gap-4">
+{cards}</div>
+</main></div></body></html>
+'''
+
+
+def subreddit_name(index):
+    return f'bench{index:06d}'
+
+def subreddit_index(name):
+    try:
+        return int(name.lower().replace('t5_', '').replace('bench', ''))
+    except ValueError:
+        return None
+
+def subreddit_data(index, match_every=10):
+    # Every match_every-th subreddit mentions MATCH_KEYWORD; subscriber
+    # counts are spread over 0..1M so range filters reject a share too.
+    topic = MATCH_KEYWORD if index % match_every == 0 else 'topic'
+    name = subreddit_name(index)
+    return {
+        'display_name': name,
+        'id': f'{index:06d}',
+        'name': f't5_{index:06d}',
+        'title': f'Bench {topic} community {index}',
+        'public_description': f'A generated {topic} subreddit used by the offline benchmarks.',
+        'subscribers': (index * 7919) % 1_000_000,
+        'active_user_count': None,
+        'accounts_active': None,
+        'over18': False,
+        'created_utc': NOW - index * 3600,
+        'url': f'/r/{name}/',
+    }
+
+def listing(children, after=None):
+    return {'kind': 'Listing', 'data': {'after': after, 'before': None, 'dist': len(children), 'children': children}}
+
+def server_card(keyword, index):
+    return CARD_TEMPLATE.format(id=100000000000000000 + index, index=index, keyword=keyword, members=(index * 6151) % 200000)
+
+def search_page(keyword, first, count):
+    cards = ''.join(server_card(keyword, index) for index in range(first, first + count))
+    return PAGE_TEMPLATE.format(keyword=keyword, cards=cards)
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def settings(self):
+        return self.server.settings
+
+    def send_body(self, body, content_type='application/json', status=200):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return parse_qs(self.rfile.read(length).decode('utf-8')) if length else {}
+
+    def do_POST(self):
+        self.handle_request(self.read_form())
+
+    def do_GET(self):
+        self.handle_request({})
+
+    def handle_request(self, form):
+        if self.settings['latency']:
+            time.sleep(self.settings['latency'])
+        url = urlsplit(self.path)
+        path = unquote(url.path).rstrip('/')
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        query.update({key: values[-1] for key, values in form.items()})
+        parts = path.strip('/').split('/')
+        if path == '/api/v1/access_token':
+            return self.send_body({'access_token': 'benchmark', 'token_type': 'bearer', 'expires_in': 86400, 'scope': '*'})
+        if path in ('/subreddits/popular', '/subreddits/new', '/subreddits/default', '/subreddits/search'):
+            return self.send_body(self.subreddit_listing(parts[1], query))
+        if path == '/api/search_reddit_names':
+            return self.send_body({'names': self.matching_names(query.get('query', ''), NAME_SEARCH_LIMIT)})
+        if path == '/api/info':
+            children = []
+            for name in query.get('sr_name', '').split(','):
+                index = subreddit_index(name)
+                if index is not None and index < self.settings['subreddits']:
+                    children.append({'kind': 't5', 'data': subreddit_data(index, self.settings['match_every'])})
+            return self.send_body(listing(children))
+        if parts[0] == 'r' and len(parts) >= 2:
+            return self.subreddit_route(parts[1], parts[2:])
+        if parts[0] == 'search' and len(parts) == 2:
+            return self.discord_page(parts[1], int(query.get('page', 1)))
+        self.send_body({'error': 404}, status=404)
+
+    def subreddit_listing(self, source, query):
+        # popular lists every subreddit; new and default are empty so a broad
+        # crawl costs one pass over the data plus the vowel searches.
+        count = self.settings['subreddits']
+        if source in ('new', 'default'):
+            return listing([])
+        if source == 'search':
+            indexes = self.search_indexes(query.get('q', '').lower())
+        else:
+            indexes = range(count)
+        start = 0
+        after = query.get('after')
+        if after:
+            start = bisect.bisect_right(indexes, subreddit_index(after))
+        limit = min(int(query.get('limit', PAGE_SIZE)), PAGE_SIZE)
+        page = indexes[start:start + limit]
+        children = [{'kind': 't5', 'data': subreddit_data(index, self.settings['match_every'])} for index in page]
+        next_after = children[-1]['data']['name'] if page and start + limit < len(indexes) else None
+        return listing(children, next_after)
+
+    def search_indexes(self, keyword):
+        # Computed once per query; later pages of the same search reuse it.
+        cache = self.server.search_cache
+        if keyword not in cache:
+            match_every = self.settings['match_every']
+            cache[keyword] = [
+                index for index in range(self.settings['subreddits'])
+                if keyword in subreddit_data(index, match_every)['title'].lower()
+            ]
+        return cache[keyword]
+
+    def matching_names(self, keyword, limit):
+        keyword = keyword.lower()
+        names = []
+        for index in range(self.settings['subreddits']):
+            if keyword in subreddit_data(index, self.settings['match_every'])['title'].lower():
+                names.append(subreddit_name(index))
+                if len(names) == limit:
+                    break
+        return names
+
+    def subreddit_route(self, name, rest):
+        index = subreddit_index(name)
+        if index is None or index >= self.settings['subreddits']:
+            return self.send_body({'error': 404}, status=404)
+        if not rest:
+            return self.send_body(self.settings['subreddit_page'], 'text/html; charset=utf-8')
+        if rest == ['about']:
+            return self.send_body({'kind': 't5', 'data': subreddit_data(index, self.settings['match_every'])})
+        if rest == ['new']:
+            post = {
+                'id': f'p{index}', 'name': f't3_p{index}', 'title': f'Post in {name}',
+                'created_utc': time.time() - (index % 30) * 86400, 'author': 'bench', 'subreddit': name,
+                'permalink': f'/r/{name}/comments/p{index}/', 'url': f'/r/{name}/comments/p{index}/',
+            }
+            return self.send_body(listing([{'kind': 't3', 'data': post}]))
+        if rest == ['about', 'rules']:
+            rules = [
+                {'kind': 'all', 'short_name': f'Rule {number}', 'description': f'Rule {number} of {name}.',
+                 'violation_reason': f'Rule {number}', 'created_utc': NOW, 'priority': number, 'description_html': None}
+                for number in range(1, 4)
+            ]
+            return self.send_body({'rules': rules, 'site_rules': [], 'site_rules_flow': []})
+        self.send_body({'error': 404}, status=404)
+
+    def discord_page(self, keyword, page):
+        first = (page - 1) * CARDS_PER_PAGE
+        count = max(0, min(CARDS_PER_PAGE, self.settings['cards'] - first))
+        if page == 1 and count == CARDS_PER_PAGE:
+            return self.send_body(self.settings['search_page'], 'text/html; charset=utf-8')
+        self.send_body(search_page(keyword, first, count), 'text/html; charset=utf-8')
+
+
+def _serve(settings, ready):
+    with open(os.path.join(FIXTURES_DIR, SUBREDDIT_PAGE), encoding='utf-8') as f:
+        settings['subreddit_page'] = f.read()
+    with open(os.path.join(FIXTURES_DIR, SEARCH_PAGE), encoding='utf-8') as f:
+        settings['search_page'] = f.read()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeHandler)
+    server.daemon_threads = True
+    server.settings = settings
+    server.search_cache = {}
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeServer:
+    def __init__(self, subreddits=1000, cards=240, latency=0.0, match_every=10):
+        self.settings = {'subreddits': subreddits, 'cards': cards, 'latency': latency, 'match_every': match_every}
+        self.url = None
+        self._process = None
+
+    def start(self):
+        ready = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(self.settings, ready), daemon=True)
+        self._process.start()
+        self.url = f'http://127.0.0.1:{ready.get(timeout=30)}'
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class LocalRedirectAdapter(HTTPAdapter):
+    # Mounted on a requests session for a real host (www.reddit.com) so code
+    # that builds live URLs is served by the fake server instead.
+    def __init__(self, base_url, **kwargs):
+        self.base_url = base_url.rstrip('/')
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = self.base_url + parts.path + (f'?{parts.query}' if parts.query else '')
+        return super().send(request, **kwargs)
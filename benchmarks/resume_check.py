@@ -0,0 +1,116 @@
+import argparse
+import contextlib
+import csv
+import io
+import os
+import sys
+import tempfile
+import threading
+from benchmarks.bench_pipeline import point_clients_at
+from benchmarks.fake_server import MATCH_KEYWORD, FakeServer
+import Reddit.main as reddit_main
+
+# Crash-and-resume regression run against benchmarks.fake_server. A broad
+# crawl is interrupted while checking its --crash-after-th candidate, then
+# continued with --resume; together the two runs must check every subreddit
+# and write every row an uninterrupted run does, each row once, e.g.
+#   python -m benchmarks.resume_check --subreddits 2000 --crash-after 300
+
+
+def run_scraper(argv, verbose=False):
+    saved = sys.argv
+    sys.argv = ['main'] + argv
+    try:
+        args = reddit_main.parse_args()
+    finally:
+        sys.argv = saved
+    with contextlib.redirect_stdout(io.StringIO()) if not verbose else contextlib.nullcontext():
+        reddit_main.run(args)
+
+@contextlib.contextmanager
+def track_checked(crash_after=None):
+    # Records every subreddit build_row is called for. With crash_after, the
+    # crash_after-th call and every later one raise KeyboardInterrupt, like a
+    # run stopped with Ctrl+C while those candidates were in flight.
+    checked = []
+    lock = threading.Lock()
+    original = reddit_main.build_row
+
+    def build_row(sub, *args, **kwargs):
+        with lock:
+            if crash_after is not None and len(checked) + 1 >= crash_after:
+                raise KeyboardInterrupt
+            checked.append(sub.display_name)
+        return original(sub, *args, **kwargs)
+
+    reddit_main.build_row = build_row
+    try:
+        yield checked
+    finally:
+        reddit_main.build_row = original
+
+def read_links(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row['Link'] for row in csv.DictReader(f)]
+
+def scraper_args(tmp, name, args):
+    return [
+        '--keyword', MATCH_KEYWORD,
+        '--discovery', 'broad',
+        '--output', os.path.join(tmp, f'{name}.csv'),
+        '--cache-path', os.path.join(tmp, f'{name}_cache.sqlite3'),
+        '--index-path', os.path.join(tmp, f'{name}_index.sqlite3'),
+        '--workers', str(args.workers),
+        '--checkpoint-every', str(args.checkpoint_every),
+        '--api-rpm', '1e9',
+        '--html-rpm', '1e9',
+    ]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check that an interrupted and resumed crawl matches an uninterrupted one')
+    parser.add_argument('--subreddits', type=int, default=2000, help='Subreddits served by the fake Reddit API')
+    parser.add_argument('--crash-after', type=int, default=300, help='Interrupt the first run while it checks this candidate')
+    parser.add_argument('--checkpoint-every', type=int, default=50, help='--checkpoint-every passed to the scraper')
+    parser.add_argument('--workers', type=int, default=8, help='--workers passed to the scraper')
+    parser.add_argument('--verbose', action='store_true', help="Show the scraper's own output")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    with FakeServer(args.subreddits, 0) as server, tempfile.TemporaryDirectory() as tmp:
+        point_clients_at(server)
+        with track_checked() as clean_checked:
+            run_scraper(scraper_args(tmp, 'clean', args), args.verbose)
+        clean_links = read_links(os.path.join(tmp, 'clean.csv'))
+
+        resumed = scraper_args(tmp, 'resumed', args)
+        with track_checked(args.crash_after) as first_checked:
+            try:
+                run_scraper(resumed, args.verbose)
+                print(f'Run finished before candidate {args.crash_after}; use a smaller --crash-after')
+                return 1
+            except KeyboardInterrupt:
+                pass
+        with track_checked() as second_checked:
+            run_scraper(resumed + ['--resume'], args.verbose)
+        resumed_links = read_links(os.path.join(tmp, 'resumed.csv'))
+
+    missing = set(clean_checked) - set(first_checked) - set(second_checked)
+    duplicates = len(resumed_links) - len(set(resumed_links))
+    print(f'Clean run: checked {len(clean_checked)}, wrote {len(clean_links)}')
+    print(f'Interrupted run: checked {len(first_checked)} + {len(second_checked)} after --resume, wrote {len(resumed_links)}')
+    problems = []
+    if missing:
+        problems.append(f'{len(missing)} subreddits never checked, e.g. {sorted(missing)[:5]}')
+    if set(resumed_links) != set(clean_links):
+        problems.append(f'{len(set(clean_links) - set(resumed_links))} rows missing, {len(set(resumed_links) - set(clean_links))} extra')
+    if duplicates:
+        problems.append(f'{duplicates} duplicate rows')
+    for problem in problems:
+        print(f'FAIL: {problem}')
+    if not problems:
+        print('OK: the resumed crawl matches the uninterrupted one')
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
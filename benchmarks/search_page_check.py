@@ -0,0 +1,69 @@
+import os
+import sys
+from benchmarks.fake_server import CARDS_PER_PAGE, FIXTURES_DIR, SEARCH_PAGE, FakeServer
+from Discord.cards import parse_server_cards
+from Discord.http_backend import iter_search_pages
+
+# Checks the card parser against the saved discordservers.com search page
+# (benchmarks/fixtures/discordservers_search.html) and that the HTTP backend
+# returns the same cards when the fake server serves it as page 1, e.g.
+#   python -m benchmarks.search_page_check
+
+EXPECTED_CARDS = 24
+EXPECTED_FIRST = {
+    'Name': 'Oyun Sunucusu 0',
+    'Description': 'Türkçe oyun topluluğu #0 - turnuvalar, etkinlikler ve sohbet.',
+    'Members': 62390,
+    'Link': 'https://discordservers.com/server/100000000000000000',
+}
+EXPECTED_LAST = {
+    'Name': 'Oyun Sunucusu 23',
+    'Description': 'Türkçe oyun topluluğu #23 - turnuvalar, etkinlikler ve sohbet.',
+    'Members': 219283,
+    'Link': 'https://discordservers.com/server/100000000000000023',
+}
+EXPECTED_MEMBERS = 3087388
+
+
+def read_fixture():
+    with open(os.path.join(FIXTURES_DIR, SEARCH_PAGE), encoding='utf-8') as f:
+        return f.read()
+
+def check_fixture(html):
+    cards = parse_server_cards(html)
+    problems = []
+    if len(cards) != EXPECTED_CARDS:
+        problems.append(f'parsed {len(cards)} cards, expected {EXPECTED_CARDS}')
+    if cards and cards[0] != EXPECTED_FIRST:
+        problems.append(f'first card is {cards[0]}')
+    if cards and cards[-1] != EXPECTED_LAST:
+        problems.append(f'last card is {cards[-1]}')
+    members = sum(card['Members'] or 0 for card in cards)
+    if members != EXPECTED_MEMBERS:
+        problems.append(f'members add up to {members}, expected {EXPECTED_MEMBERS}')
+    return problems
+
+def check_served(html):
+    # Two pages: the fixture and one generated page, which must not be
+    # mistaken for a repeat of the first.
+    with FakeServer(0, 2 * CARDS_PER_PAGE) as server:
+        served = list(iter_search_pages('oyun', max_loads=1, base_url=server.url, workers=2))
+        expected = parse_server_cards(html, server.url)
+    problems = []
+    if served[:CARDS_PER_PAGE] != expected:
+        problems.append('page 1 from the fake server does not match the fixture')
+    if len(served) != 2 * CARDS_PER_PAGE:
+        problems.append(f'fetched {len(served)} cards over two pages, expected {2 * CARDS_PER_PAGE}')
+    return problems
+
+def main():
+    html = read_fixture()
+    problems = check_fixture(html) + check_served(html)
+    for problem in problems:
+        print(f'FAIL: {problem}')
+    if not problems:
+        print(f'OK: {EXPECTED_CARDS} cards parsed from {SEARCH_PAGE} and served as page 1')
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from result_store import ResultStore
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key, label, total=None, columns=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.key = key
+        self.label = label
+        self.total = total
+        self.status = QUEUED
+        self.error = None
+        self.messages = []
+        self.processed = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.results = ResultStore(columns or {})
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_row(self, row):
+        self.results.append(row)
+
+    def advance(self, count=1):
+        # Called by the worker for every processed item; raises once the job
+        # has been cancelled so the worker stops at the next item.
+        if self._cancel.is_set():
+            raise JobCancelled()
+        with self._lock:
+            self.processed += count
+
+    def log(self, message):
+        with self._lock:
+            self.messages.append(message)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def frame(self):
+        return self.results.frame()
+
+    @property
+    def finished_ok(self):
+        return self.status == DONE
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def throughput(self):
+        elapsed = self.elapsed()
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        rate = self.throughput()
+        if not self.total or self.total < 0 or not rate or not self.active:
+            return None
+        return max(0.0, (self.total - self.processed) / rate)
+
+
+class JobRegistry:
+    # Runs scrapes on a shared thread pool. A job is identified by its query
+    # key, so an identical query joins the running job or reuses a finished
+    # one for keep_seconds.
+    def __init__(self, max_workers=4, keep_seconds=3600):
+        self.keep_seconds = keep_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _reusable(self, job):
+        if job.active:
+            return True
+        return job.finished_ok and time.time() - job.finished < self.keep_seconds
+
+    def find(self, key):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and self._reusable(job):
+                    return job
+        return None
+
+    def find_finished(self, match):
+        # Newest finished job whose key satisfies match, e.g. one run with a
+        # looser filter whose results can be filtered again in memory.
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job.created, reverse=True)
+            for job in jobs:
+                if not job.active and self._reusable(job) and match(job.key):
+                    return job
+        return None
+
+    def submit(self, key, label, fn, *args, total=None, columns=None):
+        with self._lock:
+            self._prune()
+            for job in self._jobs.values():
+                if job.key == key and self._reusable(job):
+                    return job
+            job = Job(key, label, total=total, columns=columns)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            fn(job, *args)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if not job.active and now - job.finished > self.keep_seconds:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created, reverse=True)
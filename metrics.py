@@ -0,0 +1,236 @@
+import bisect
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets; anything slower
+# lands in a final overflow bucket.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+class StageMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.counts = Counter()
+
+    def observe(self, seconds, error=False):
+        self.calls += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the given fraction of the calls.
+        if not self.calls:
+            return 0.0
+        target = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.histogram):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.calls if self.calls else 0.0,
+            'p50_seconds': self.percentile(0.5),
+            'p95_seconds': self.percentile(0.95),
+            'max_seconds': self.max,
+            'histogram': {
+                **{f'<={bound}s': count for bound, count in zip(LATENCY_BUCKETS, self.histogram)},
+                f'>{LATENCY_BUCKETS[-1]}s': self.histogram[-1],
+            },
+            'bytes': self.bytes,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'counts': dict(self.counts),
+        }
+
+
+class Metrics:
+    # Per-stage call counts, latency histograms, bytes, cache hits and named
+    # counters (e.g. rejection reasons). Recording is a perf_counter call and
+    # a short lock, cheap enough to leave on for every run.
+    def __init__(self):
+        self.started = time.time()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name):
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = StageMetrics(name)
+        return stage
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, error)
+
+    def timed_iter(self, name, iterable):
+        # Times how long each item takes to come out of a generator, e.g. the
+        # discovery crawl, excluding the time the consumer spends on it.
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(name, time.perf_counter() - start)
+            yield item
+
+    def observe(self, name, seconds, error=False):
+        with self._lock:
+            self._stage(name).observe(seconds, error)
+
+    def count(self, name, key, amount=1):
+        with self._lock:
+            self._stage(name).counts[key] += amount
+
+    def add_bytes(self, name, amount):
+        with self._lock:
+            self._stage(name).bytes += amount
+
+    def cache(self, name, hit):
+        with self._lock:
+            stage = self._stage(name)
+            if hit:
+                stage.cache_hits += 1
+            else:
+                stage.cache_misses += 1
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: stage.to_dict() for name, stage in self._stages.items()}
+        return {'started': self.started, 'elapsed_seconds': time.time() - self.started, 'stages': stages}
+
+    def rows(self):
+        # One flat row per stage, for tables.
+        rows = []
+        for name, stage in self.snapshot()['stages'].items():
+            lookups = stage['cache_hits'] + stage['cache_misses']
+            rows.append({
+                'Stage': name,
+                'Calls': stage['calls'],
+                'Errors': stage['errors'],
+                'Total s': round(stage['total_seconds'], 3),
+                'Mean ms': round(stage['mean_seconds'] * 1000, 2),
+                'p50 ms': round(stage['p50_seconds'] * 1000, 2),
+                'p95 ms': round(stage['p95_seconds'] * 1000, 2),
+                'Max ms': round(stage['max_seconds'] * 1000, 2),
+                'KB': round(stage['bytes'] / 1024, 1),
+                'Cache hit': f"{stage['cache_hits'] / lookups:.0%}" if lookups else '',
+                'Counts': ', '.join(f'{key}={count}' for key, count in sorted(stage['counts'].items(), key=lambda item: -item[1])),
+            })
+        return rows
+
+    def summary(self):
+        rows = self.rows()
+        if not rows:
+            return 'No metrics recorded'
+        columns = list(rows[0])
+        widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+        lines = ['  '.join(column.ljust(widths[column]) for column in columns).rstrip()]
+        for row in rows:
+            lines.append('  '.join(str(row[column]).ljust(widths[column]) for column in columns).rstrip())
+        return '\n'.join(lines)
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+_metrics = Metrics()
+
+def get_metrics():
+    return _metrics
+
+@contextmanager
+def profile(kind=None, output=None):
+    # Optional whole-run profiling. cProfile prints the 30 most expensive
+    # calls by cumulative time (or dumps pstats to output); pyinstrument is
+    # imported only when asked for and prints its call tree (or writes HTML).
+    if kind is None:
+        yield
+        return
+    if kind == 'cprofile':
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if output:
+                profiler.dump_stats(output)
+                print(f'Profile written to {output}')
+            else:
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(30)
+    elif kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError('--profile pyinstrument requires pyinstrument (pip install pyinstrument)')
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+                print(f'Profile written to {output}')
+            else:
+                print(profiler.output_text(unicode=True))
+    else:
+        raise ValueError(f"Unknown profiler '{kind}', use one of: {', '.join(PROFILERS)}")
+
+def add_metrics_args(parser):
+    parser.add_argument('--metrics-json', help='Write per-stage timings, counts, bytes and cache hits to this JSON file')
+    parser.add_argument('--profile', choices=PROFILERS, help='Profile the whole run with cProfile or pyinstrument')
+    parser.add_argument('--profile-output', help='Save the profile here (pstats file for cprofile, HTML for pyinstrument) instead of printing it')
+
+def run_instrumented(args, run):
+    # Runs run(args) under the profiler chosen by add_metrics_args' options
+    # and prints the per-stage table afterwards, also when the run fails.
+    metrics = get_metrics()
+    try:
+        with profile(args.profile, args.profile_output):
+            run(args)
+    finally:
+        print(metrics.summary())
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+            print(f'Metrics written to {args.metrics_json}')
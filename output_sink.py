@@ -0,0 +1,304 @@
+import csv
+import json
+import os
+import re
+import xlsxwriter
+from metrics import get_metrics
+
+# Rows are written as soon as a scraper produces them. Formats that cannot be
+# appended to in place (xlsx, parquet) also keep a JSONL journal next to the
+# output, so a crashed run can be resumed and the journal is removed once the
+# file has been closed cleanly.
+JOURNAL_SUFFIX = '.partial.jsonl'
+# Excel limits worksheet names to 31 characters and forbids these.
+SHEET_NAME_RE = re.compile(r'[\[\]:*?/\\]')
+MAX_SHEET_NAME = 31
+# Parquet types for the result_store column types; other columns are strings.
+PARQUET_TYPES = {'Int64': 'int64', 'Float64': 'float64'}
+
+
+class OutputSink:
+    # Typed sinks are given numbers and None rather than display strings.
+    typed = False
+
+    def __init__(self, path, fieldnames, resume=False, flush_every=50, key_field='Link'):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.flush_every = flush_every
+        self.key_field = key_field
+        self.existing_keys = set()
+        self.rows_written = 0
+        self._unflushed = 0
+        self._open(resume)
+
+    def _open(self, resume):
+        raise NotImplementedError
+
+    def _write(self, row):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        self.close()
+
+    def write(self, row):
+        with get_metrics().time('write'):
+            self._write(row)
+        if self.key_field and row.get(self.key_field):
+            self.existing_keys.add(row[self.key_field])
+        self.rows_written += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            with get_metrics().time('flush'):
+                self.flush()
+            self._unflushed = 0
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class CsvSink(OutputSink):
+    def _open(self, resume):
+        appending = resume and os.path.exists(self.path)
+        if appending:
+            drop_partial_line(self.path)
+            with open(self.path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    self.existing_keys.add(row.get(self.key_field))
+                    self.rows_written += 1
+        self._file = open(self.path, 'a' if appending else 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+        if not appending:
+            self._writer.writeheader()
+
+    def _write(self, row):
+        self._writer.writerow(row)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlSink(OutputSink):
+    def _open(self, resume):
+        appending = resume and os.path.exists(self.path)
+        if appending:
+            drop_partial_line(self.path)
+            for row in read_jsonl(self.path):
+                self.existing_keys.add(row.get(self.key_field))
+                self.rows_written += 1
+        self._file = open(self.path, 'a' if appending else 'w', encoding='utf-8')
+
+    def _write(self, row):
+        self._file.write(json.dumps({key: row.get(key, '') for key in self.fieldnames}, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _JournaledSink(OutputSink):
+    def _open(self, resume):
+        # File-like targets (e.g. BytesIO in Streamlit) have nothing to resume.
+        self._journal = None
+        replay = []
+        if isinstance(self.path, str):
+            journal_path = self.path + JOURNAL_SUFFIX
+            if resume and os.path.exists(journal_path):
+                drop_partial_line(journal_path)
+                replay = list(read_jsonl(journal_path))
+            elif resume and os.path.exists(self.path):
+                raise FileExistsError(f'{self.path} was already completed; there is no partial output to resume')
+            self._journal = open(journal_path, 'a' if replay else 'w', encoding='utf-8')
+        self._start()
+        for row in replay:
+            self._write(row)
+            self.existing_keys.add(row.get(self.key_field))
+            self.rows_written += 1
+
+    def _start(self):
+        raise NotImplementedError
+
+    def _finish(self):
+        raise NotImplementedError
+
+    def write(self, row):
+        if self._journal is not None:
+            self._journal.write(json.dumps({key: row.get(key, '') for key in self.fieldnames}, ensure_ascii=False) + '\n')
+        super().write(row)
+
+    def flush(self):
+        if self._journal is not None:
+            self._journal.flush()
+
+    def close(self):
+        self._finish()
+        if self._journal is not None:
+            self._journal.close()
+            os.remove(self.path + JOURNAL_SUFFIX)
+
+    def abort(self):
+        # Leave a readable partial file but keep the journal for --resume.
+        self._finish()
+        if self._journal is not None:
+            self._journal.close()
+
+
+class ExcelSink(_JournaledSink):
+    def __init__(self, path, fieldnames, resume=False, flush_every=50, key_field='Link', link_fields=('Link',), sheet_field=None):
+        # With sheet_field, rows go to one worksheet per value of that field
+        # (e.g. one sheet per keyword) and the field itself is not a column.
+        self.link_fields = set(link_fields)
+        self.sheet_field = sheet_field
+        super().__init__(path, fieldnames, resume=resume, flush_every=flush_every, key_field=key_field)
+
+    def _start(self):
+        # constant_memory keeps only the current row in memory; it is not
+        # available for in-memory (file-like) targets.
+        options = {'constant_memory': True} if isinstance(self.path, str) else {}
+        self._workbook = xlsxwriter.Workbook(self.path, options)
+        self._columns = [name for name in self.fieldnames if name != self.sheet_field]
+        self._sheets = {}
+        self._sheet_names = set()
+        if self.sheet_field is None:
+            self._sheets[None] = self._add_sheet(None)
+
+    def _add_sheet(self, name):
+        worksheet = self._workbook.add_worksheet(self._sheet_name(name) if name is not None else None)
+        for col, column in enumerate(self._columns):
+            worksheet.write(0, col, column)
+        return [worksheet, 1]
+
+    def _sheet_name(self, value):
+        base = SHEET_NAME_RE.sub('', str(value)).strip("' ")[:MAX_SHEET_NAME] or 'Sheet'
+        name = base
+        suffix = 2
+        while name.lower() in self._sheet_names:
+            tail = f' ({suffix})'
+            name = base[:MAX_SHEET_NAME - len(tail)] + tail
+            suffix += 1
+        self._sheet_names.add(name.lower())
+        return name
+
+    def _write(self, row):
+        key = row.get(self.sheet_field, '') if self.sheet_field is not None else None
+        sheet = self._sheets.get(key)
+        if sheet is None:
+            sheet = self._sheets[key] = self._add_sheet(key)
+        worksheet, next_row = sheet
+        for col, column in enumerate(self._columns):
+            if column in self.link_fields and row.get(column):
+                worksheet.write_url(next_row, col, row[column], string=row[column])
+            else:
+                worksheet.write(next_row, col, row.get(column, ''))
+        sheet[1] = next_row + 1
+
+    def _finish(self):
+        self._workbook.close()
+
+
+class ParquetSink(_JournaledSink):
+    typed = True
+
+    def __init__(self, path, fieldnames, resume=False, flush_every=50, key_field='Link', columns=None):
+        # columns maps field names to result_store types (e.g. REDDIT_COLUMNS);
+        # they set the schema, so counts and ratios stay numeric.
+        self.columns = columns or {}
+        super().__init__(path, fieldnames, resume=resume, flush_every=flush_every, key_field=key_field)
+
+    def _type(self, name):
+        return PARQUET_TYPES.get(self.columns.get(name), 'string')
+
+    def _value(self, value, kind):
+        if value is None or value == '':
+            return None
+        if kind == 'int64':
+            return int(value)
+        if kind == 'float64':
+            return float(value)
+        return str(value)
+
+    def _start(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError('Parquet output requires pyarrow (pip install pyarrow)')
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema([(name, getattr(pyarrow, self._type(name))()) for name in self.fieldnames])
+        self._writer = pyarrow.parquet.ParquetWriter(self.path, self._schema)
+        self._batch = []
+
+    def _write(self, row):
+        self._batch.append(row)
+
+    def _write_batch(self):
+        if self._batch:
+            columns = {
+                name: [self._value(row.get(name), self._type(name)) for row in self._batch]
+                for name in self.fieldnames
+            }
+            self._writer.write_table(self._pyarrow.table(columns, schema=self._schema))
+            self._batch = []
+
+    def flush(self):
+        self._write_batch()
+        super().flush()
+
+    def _finish(self):
+        self._write_batch()
+        self._writer.close()
+
+
+SINKS = {
+    '.xlsx': ExcelSink,
+    '.csv': CsvSink,
+    '.jsonl': JsonlSink,
+    '.parquet': ParquetSink,
+}
+
+def drop_partial_line(path):
+    # A crash can leave the last line half written; cut it off before
+    # appending so the next row starts on a fresh line.
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def open_sink(path, fieldnames, resume=False, flush_every=50, key_field='Link', sheet_field=None, columns=None):
+    # sheet_field only changes the layout of xlsx output; the other formats
+    # keep it as an ordinary column. columns (result_store types) only sets
+    # the parquet schema.
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in SINKS:
+        raise ValueError(f"Unsupported output format '{ext}', use one of: {', '.join(SINKS)}")
+    options = {'sheet_field': sheet_field} if sheet_field and ext == '.xlsx' else {}
+    if columns and ext == '.parquet':
+        options['columns'] = columns
+    return SINKS[ext](path, fieldnames, resume=resume, flush_every=flush_every, key_field=key_field, **options)
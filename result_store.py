@@ -0,0 +1,117 @@
+import threading
+import pandas as pd
+
+# Result columns and their types. Counts stay numeric (nullable, so an online
+# count that could not be read is NA rather than '') and Online Ratio is a
+# fraction; both are only turned into display strings by export_rows.
+REDDIT_COLUMNS = {
+    'Title': 'string',
+    'Total Users': 'Int64',
+    'Online Users': 'Int64',
+    'Online Ratio': 'Float64',
+    'Description': 'string',
+    'Link': 'string',
+    'Kurallar': 'string',
+}
+DISCORD_COLUMNS = {
+    'Name': 'string',
+    'Description': 'string',
+    'Members': 'Int64',
+    'Link': 'string',
+}
+NUMERIC_TYPES = {'Int64', 'Float64'}
+PERCENT_COLUMNS = {'Online Ratio'}
+
+
+def typed_frame(rows, columns):
+    # Rows may carry extra keys (e.g. Keywords); they are kept as they are.
+    frame = pd.DataFrame(list(rows))
+    for name, dtype in columns.items():
+        if name not in frame:
+            frame[name] = pd.Series(pd.NA, index=frame.index, dtype=dtype)
+        elif dtype in NUMERIC_TYPES:
+            values = pd.to_numeric(frame[name].replace('', None), errors='coerce')
+            frame[name] = values.round().astype(dtype) if dtype == 'Int64' else values.astype(dtype)
+        else:
+            frame[name] = frame[name].astype(dtype)
+    extra = [name for name in frame.columns if name not in columns]
+    return frame[list(columns) + extra]
+
+def result_frame(rows, columns):
+    # Typed frame plus the columns derived from others.
+    frame = typed_frame(rows, columns)
+    if 'Online Ratio' in columns:
+        add_online_ratio(frame)
+    return frame
+
+def add_online_ratio(frame):
+    total = frame['Total Users']
+    frame['Online Ratio'] = (frame['Online Users'].astype('Float64') / total.astype('Float64')).where(total > 0)
+    return frame
+
+def in_range(frame, column, minimum=-1, maximum=-1):
+    # Boolean mask with the scrapers' -1 meaning "no limit"; NA counts as 0,
+    # the same as the row-by-row filters.
+    values = frame[column].fillna(0)
+    mask = pd.Series(True, index=frame.index)
+    if minimum != -1:
+        mask &= values >= minimum
+    if maximum != -1:
+        mask &= values <= maximum
+    return mask
+
+def export_rows(frame, formatted=True):
+    # The only place values are formatted: percentages become "12.34%" and
+    # missing values empty strings, ready for a sink or a table. Unformatted
+    # rows keep plain Python numbers and None, for typed outputs (Parquet).
+    if not formatted:
+        frame = frame.astype(object)
+        return frame.where(frame.notna(), None).to_dict('records')
+    frame = frame.astype(object).where(frame.notna(), '')
+    for name in PERCENT_COLUMNS & set(frame.columns):
+        frame[name] = [f'{value * 100:.2f}%' if value != '' else '' for value in frame[name]]
+    return frame.to_dict('records')
+
+
+class ResultStore:
+    # Typed, columnar result set. Rows are appended one at a time but typed
+    # and stored batch_size at a time, so reading the whole set only
+    # converts the rows added since the last full batch.
+    def __init__(self, columns, batch_size=500):
+        self.columns = columns
+        self.batch_size = batch_size
+        self._frames = []
+        self._frame = None
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(frame) for frame in self._frames) + len(self._pending)
+
+    def _seal(self):
+        self._frames.append(result_frame(self._pending, self.columns))
+        self._pending = []
+        self._frame = None
+
+    def append(self, row):
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._seal()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def frame(self):
+        with self._lock:
+            if self._frame is None:
+                frames = [frame for frame in self._frames if len(frame)]
+                self._frame = pd.concat(frames, ignore_index=True) if frames else typed_frame([], self.columns)
+            sealed = self._frame
+            pending = list(self._pending)
+        if not pending:
+            return sealed.copy()
+        tail = result_frame(pending, self.columns)
+        return pd.concat([sealed, tail], ignore_index=True) if len(sealed) else tail
@@ -3,22 +3,201 @@ import pandas as pd
 import os
 import json
 from io import BytesIO
-from Discord.discord_server_scraper import scrape_discordservers
-from Reddit.subreddit_scraper import fetch_all_subreddits, filter_subreddit, get_subreddit_data
-from Reddit.main import get_online_users_requests
-import xlsxwriter
+from Discord.discord_server_scraper import iter_discordservers
+from Reddit.subreddit_scraper import fetch_all_subreddits, hydrate_subreddits
+from Reddit.main import enrich_subreddits
+from Reddit.cache import SubredditCache
+from Reddit.discovery import DiscoveryStats
+from metrics import get_metrics
+from output_sink import ExcelSink
+from job_runner import JobRegistry
+from result_store import DISCORD_COLUMNS, REDDIT_COLUMNS, export_rows, in_range
+
+RESULT_TTL = 3600
 
 st.set_page_config(page_title="Reddit & Discord Scraper", layout="wide")
 st.title("Reddit & Discord Scraper")
 
+@st.cache_resource
+def get_subreddit_cache():
+    return SubredditCache()
+
+@st.cache_resource
+def get_job_registry():
+    # Tek bir registry tüm oturumlar arasında paylaşılır; aynı sorgu çalışan işe bağlanır.
+    return JobRegistry(max_workers=4, keep_seconds=RESULT_TTL)
+
+def covers(job_key, key):
+    # Anahtarlar (tarama ayarları, (min, max)) şeklindedir. Aynı ayarlarla daha
+    # geniş bir aralıkta biten iş, dar aralığın bulacağı her satırı zaten içerir.
+    (job_scrape, (job_min, job_max)), (scrape, (minimum, maximum)) = job_key, key
+    if job_scrape != scrape:
+        return False
+    if job_min != -1 and (minimum == -1 or minimum < job_min):
+        return False
+    if job_max != -1 and (maximum == -1 or maximum > job_max):
+        return False
+    return True
+
+@st.cache_data(ttl=RESULT_TTL, show_spinner=False)
+def cached_result(key):
+    # Sadece biten işler önbelleğe alınır; hata durumunda st.cache_data bir şey saklamaz.
+    job = get_job_registry().find(key)
+    if job is None or not job.finished_ok:
+        raise LookupError(key)
+    return job.frame()
+
+def cached_frame(key, column):
+    # Aynı sorgu st.cache_data'dan gelir; sadece min/max değiştiyse daha geniş
+    # aralıklı biten bir işin sonuçları yeniden taranmadan bellekte filtrelenir.
+    try:
+        return cached_result(key)
+    except LookupError:
+        pass
+    job = get_job_registry().find_finished(lambda job_key: covers(job_key, key))
+    if job is None:
+        return None
+    frame = job.frame()
+    minimum, maximum = key[1]
+    return frame[in_range(frame, column, minimum, maximum)].reset_index(drop=True)
+
+def run_reddit_job(job, cache, keyword, min_subs, max_subs, max_age_days, search_limit, workers, debug):
+    discovery = DiscoveryStats.load(cache)
+
+    def on_done(sub, row):
+        discovery.result(sub.display_name, row is not None)
+        job.advance()
+
+    subs = fetch_all_subreddits(debug=debug, cache=cache, keyword=keyword, stats=discovery)
+    rows = enrich_subreddits(
+        hydrate_subreddits(subs, cache=cache, debug=debug),
+        keyword,
+        min_subs,
+        max_subs,
+        max_age_days,
+        workers=workers,
+        search_limit=search_limit,
+        debug=debug,
+        cache=cache,
+        on_done=on_done
+    )
+    try:
+        for row in rows:
+            if not row['Online Users']:
+                job.log(f"[WARN] Online users bulunamadı: {row['Link']}")
+            job.add_row(row)
+    finally:
+        discovery.save(cache)
+    if debug:
+        job.log(discovery.summary())
+
+def run_discord_job(job, keyword, max_loads, min_members, max_members, backend, debug):
+    for server in iter_discordservers(keyword, max_loads, min_members, max_members, debug, backend=backend):
+        job.add_row(server)
+        job.advance()
+
+def excel_bytes(frame):
+    output = BytesIO()
+    with ExcelSink(output, list(frame.columns)) as sink:
+        sink.write_many(export_rows(frame))
+    output.seek(0)
+    return output
+
+def show_frame(frame):
+    # Oran sayı olarak kalır (sıralanabilir), sadece yüzde olarak gösterilir.
+    column_config = {}
+    if 'Online Ratio' in frame:
+        frame = frame.assign(**{'Online Ratio': frame['Online Ratio'] * 100})
+        column_config['Online Ratio'] = st.column_config.NumberColumn(format="%.2f%%")
+    st.dataframe(frame, column_config=column_config)
+
+def job_status(job):
+    text = f"{job.label}: {job.status} — {len(job.results)} sonuç, {job.processed} işlendi, {job.throughput():.1f}/sn, {job.elapsed():.0f} sn"
+    eta = job.eta()
+    if eta is not None:
+        text += f", tahmini kalan {eta:.0f} sn"
+    st.caption(text)
+    if job.total and job.total > 0:
+        st.progress(min(1.0, job.processed / job.total))
+
+def show_rows(frame, file_name, empty_message):
+    if len(frame):
+        show_frame(frame)
+        st.download_button("Excel Olarak İndir", excel_bytes(frame), file_name=file_name, mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    else:
+        st.warning(empty_message)
+
+@st.fragment(run_every=1.0)
+def live_job(job_id):
+    job = get_job_registry().get(job_id)
+    if job is None:
+        return
+    if not job.active:
+        # Son sonuçları (indirme butonuyla) tam sayfa yeniden çizimi gösterir.
+        st.rerun()
+    job_status(job)
+    show_frame(job.frame())
+    if st.button("Durdur", key=f"cancel_{job_id}"):
+        job.cancel()
+
+def show_job_result(state_key, key, column, file_name, empty_message, debug):
+    # key her yeniden çizimde formdan hesaplanır; min/max değişince biten bir
+    # işin sonuçları yeniden taranmadan filtrelenir.
+    job = get_job_registry().get(st.session_state.get(f"{state_key}_job"))
+    if job is not None and job.active:
+        live_job(job.id)
+        return
+    if job is None or job.key != key:
+        frame = cached_frame(key, column)
+        if frame is not None:
+            st.caption("Önbellekten getirildi.")
+            show_rows(frame, file_name, empty_message)
+            return
+    if job is None:
+        return
+    job_status(job)
+    if job.error:
+        st.error(f"Tarama başarısız: {job.error}")
+    show_rows(job.frame(), file_name, empty_message)
+    if debug or job.messages:
+        st.subheader("Debug / Hata Mesajları")
+        for msg in job.messages:
+            st.write(msg)
+
+def start_job(state_key, key, column, label, fn, *args, total=None, columns=None):
+    st.session_state.pop(f"{state_key}_job", None)
+    if cached_frame(key, column) is None:
+        job = get_job_registry().submit(key, label, fn, *args, total=total, columns=columns)
+        st.session_state[f"{state_key}_job"] = job.id
+
+def show_metrics():
+    metrics = get_metrics()
+    with st.expander("Performans Metrikleri"):
+        st.caption("Bu sunucudaki tüm işlerin aşama bazında süreleri, çağrı sayıları, indirilen veri ve önbellek isabetleri.")
+        rows = metrics.rows()
+        if rows:
+            st.dataframe(pd.DataFrame(rows))
+            st.download_button("JSON Olarak İndir", json.dumps(metrics.snapshot(), indent=2), file_name="metrics.json", mime="application/json")
+        else:
+            st.write("Henüz ölçüm yok.")
+        if st.button("Metrikleri Sıfırla"):
+            metrics.reset()
+            st.rerun()
+
 TABS = ["Reddit", "Discord"]
 tab = st.sidebar.radio("Platform Seçin", TABS)
 
+with st.sidebar:
+    active_jobs = [job for job in get_job_registry().jobs() if job.active]
+    if active_jobs:
+        st.subheader("Çalışan İşler")
+        for job in active_jobs:
+            st.caption(f"{job.label} — {job.processed} işlendi, {len(job.results)} sonuç")
+
 if tab == "Reddit":
     st.header("Reddit Subreddit Scraper")
     # Reddit API credentials from Streamlit secrets
     creds_ready = False
-    debug_msgs = []
     if hasattr(st, 'secrets') and 'reddit' in st.secrets:
         reddit_config = st.secrets["reddit"]
         client_id = reddit_config.get("client_id", "")
@@ -40,68 +219,19 @@ if tab == "Reddit":
     max_subs = st.number_input("Maksimum Abone Sayısı", min_value=-1, value=-1)
     max_age_days = st.number_input("Son Gönderi Maksimum Yaş (gün)", min_value=-1, value=-1)
     search_limit = st.number_input("Aranacak Subreddit Limiti", min_value=-1, value=20)
+    workers = st.number_input("Eşzamanlı İstek Sayısı", min_value=1, value=8)
     debug = st.checkbox("Debug Modu", value=False)
+    key = (('reddit', keyword, int(max_age_days), int(search_limit)), (int(min_subs), int(max_subs)))
     if st.button("Reddit Subredditlerini Tara"):
         if not creds_ready:
             st.error("Reddit API bilgileri eksik!")
         else:
-            with st.spinner("Subredditler taranıyor..."):
-                checked = 0
-                fieldnames = ['Title', 'Total Users', 'Online Users', 'Online Ratio', 'Description', 'Link', 'Kurallar']
-                rows = []
-                for sub in fetch_all_subreddits(debug=debug):
-                    checked += 1
-                    if search_limit != -1 and checked > search_limit:
-                        break
-                    if filter_subreddit(sub, keyword, min_subs, max_subs, max_age_days, debug=debug):
-                        row = get_subreddit_data(sub, debug=debug)
-                        # Online Users: Önce API'den, yoksa HTML'den
-                        online_users = None
-                        try:
-                            online_users = getattr(sub, 'active_user_count', None)
-                            if online_users is None:
-                                online_users = getattr(sub, 'accounts_active', None)
-                            if online_users is None:
-                                online_users = get_online_users_requests(row['Link'])
-                                if not online_users:
-                                    debug_msgs.append(f"[WARN] Online users bulunamadı: {row['Link']}")
-                        except Exception as e:
-                            debug_msgs.append(f"[ERROR] Online users çekilemedi: {row['Link']} - {e}")
-                            online_users = ''
-                        row['Online Users'] = online_users if online_users is not None else ''
-                        try:
-                            total = int(row['Total Users'])
-                            online = int(online_users) if online_users else 0
-                            ratio = f"{(online/total*100):.2f}%" if total > 0 else ''
-                        except Exception:
-                            ratio = ''
-                        row['Online Ratio'] = ratio
-                        row.pop('Active Users', None)
-                        rows.append(row)
-                if rows:
-                    df = pd.DataFrame(rows)
-                    st.dataframe(df)
-                    # xlsxwriter ile Excel çıktısı (tıklanabilir link)
-                    output = BytesIO()
-                    workbook = xlsxwriter.Workbook(output)
-                    worksheet = workbook.add_worksheet()
-                    for col, name in enumerate(fieldnames):
-                        worksheet.write(0, col, name)
-                    for row_idx, row in enumerate(rows, 1):
-                        for col, key in enumerate(fieldnames):
-                            if key == 'Link' and row.get('Link'):
-                                worksheet.write_url(row_idx, col, row['Link'], string=row['Link'])
-                            else:
-                                worksheet.write(row_idx, col, row.get(key, ''))
-                    workbook.close()
-                    output.seek(0)
-                    st.download_button("Excel Olarak İndir", output, file_name="reddit_subs.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-                else:
-                    st.warning("Hiçbir subreddit bulunamadı.")
-                if debug or debug_msgs:
-                    st.subheader("Debug / Hata Mesajları")
-                    for msg in debug_msgs:
-                        st.write(msg)
+            start_job(
+                "reddit", key, 'Total Users', f"Reddit: {keyword}", run_reddit_job,
+                get_subreddit_cache(), keyword, int(min_subs), int(max_subs), int(max_age_days), int(search_limit), int(workers), debug,
+                total=int(search_limit), columns=REDDIT_COLUMNS
+            )
+    show_job_result("reddit", key, 'Total Users', "reddit_subs.xlsx", "Hiçbir subreddit bulunamadı.", debug)
 
 elif tab == "Discord":
     st.header("Discord Sunucu Scraper")
@@ -109,16 +239,15 @@ elif tab == "Discord":
     max_loads = st.number_input("Kaç kez 'Load More Servers' tıklansın?", min_value=1, value=3)
     min_members = st.number_input("Minimum Üye Sayısı", min_value=-1, value=-1)
     max_members = st.number_input("Maksimum Üye Sayısı", min_value=-1, value=-1)
+    backend = st.selectbox("Yöntem", ["auto", "http", "selenium"], help="auto: önce HTTP, sonuç yoksa Selenium")
     debug = st.checkbox("Debug Modu", value=False, key="discord_debug")
+    key = (('discord', keyword, int(max_loads), backend), (int(min_members), int(max_members)))
     if st.button("Discord Sunucularını Tara"):
-        with st.spinner("Sunucular taranıyor..."):
-            servers = scrape_discordservers(keyword, max_loads, min_members, max_members, debug)
-            if servers:
-                df = pd.DataFrame(servers)
-                st.dataframe(df)
-                output = BytesIO()
-                df.to_excel(output, index=False, engine='openpyxl')
-                output.seek(0)
-                st.download_button("Excel Olarak İndir", output, file_name="discord_servers.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            else:
-                st.warning("Hiç sunucu bulunamadı.") 
\ No newline at end of file
+        start_job(
+            "discord", key, 'Members', f"Discord: {keyword}", run_discord_job,
+            keyword, int(max_loads), int(min_members), int(max_members), backend, debug,
+            columns=DISCORD_COLUMNS
+        )
+    show_job_result("discord", key, 'Members', "discord_servers.xlsx", "Hiç sunucu bulunamadı.", debug)
+
+show_metrics()